@@ -1,8 +1,10 @@
-from api.customer.api import does_customer_exist
+from db.returning import changes, update_returning
 from db.schema import Address, Customer
 from fastapi import APIRouter, HTTPException, status
 from fastapi.responses import JSONResponse
 from loguru import logger
+from tortoise.exceptions import DoesNotExist, IntegrityError
+from tortoise.transactions import in_transaction
 
 from .models import AddressCreate, AddressModel, SingleAddressModel
 
@@ -11,14 +13,17 @@ router = APIRouter()
 
 @router.get("/{customer_id}", tags=["address"])
 async def get_customer_addresses(customer_id: str):
-    customerExists = await does_customer_exist(customer_id)
-    if not customerExists:
+    try:
+        addresses = await Address.filter(customer_id=customer_id)
+    except Exception as e:
+        logger.error(str(e))
+        raise HTTPException(status_code=404, detail=str(e))
+    # Every customer has a main address
+    if not addresses:
         logger.error("Customer does not exist")
         raise HTTPException(status_code=404, detail="Customer does not exist")
 
     try:
-        customer = await Customer.get(id=customer_id)
-        addresses = await customer.addresses.all()
         other_addresses = []
         for address in addresses:
             if address.is_default:
@@ -33,92 +38,81 @@ async def get_customer_addresses(customer_id: str):
 
 @router.post("/add/{customer_id}", tags=["address"])
 async def add_customer_address(customer_id: str, address: AddressCreate):
-    exists = await does_customer_exist(customer_id)
-    if exists:
-        try:
-            new_address = await Address.create(
-                **address.model_dump(), customer_id=customer_id
-            )
-            return SingleAddressModel(**dict(new_address))
-        except Exception as e:
-            logger.error(str(e))
-            raise HTTPException(status_code=404, detail=str(e))
-    else:
+    try:
+        new_address = await Address.create(
+            **address.model_dump(), customer_id=customer_id
+        )
+        return SingleAddressModel(**dict(new_address))
+    except IntegrityError:
+        # The foreign key rejects addresses of unknown customers
         logger.error("Customer not Found")
         raise HTTPException(status_code=404, detail="Customer not Found")
+    except Exception as e:
+        logger.error(str(e))
+        raise HTTPException(status_code=404, detail=str(e))
 
 
 @router.post("/updateMain/{customer_id}/{address_id}", tags=["address"])
 async def change_main_address(customer_id: str, address_id: int):
-    exists = await does_customer_exist(customer_id)
-    if exists:
-        try:
-            addresses = await Address.filter(customer_id=customer_id)
-            for address in addresses:
-                address.is_default = False
-                await address.save()
-            await Address.get(id=address_id).update(is_default=True)
-            return SingleAddressModel(**dict(address))
-        except Exception as e:
-            logger.error(str(e))
-            raise HTTPException(status_code=404, detail=str(e))
-
-    else:
-        logger.error("Customer not Found")
-        raise HTTPException(status_code=404, detail="Customer not Found")
+    try:
+        # The main address is unique per customer, and that index is checked
+        # row by row, so the old one is cleared before the new one is set.
+        # Both happen in one transaction, so readers never see two or none,
+        # and concurrent switches for a customer queue on its row.
+        async with in_transaction():
+            await Customer.filter(id=customer_id).select_for_update().only("id")
+            await Address.filter(customer_id=customer_id, is_default=True).update(
+                is_default=False
+            )
+            chosen = await update_returning(
+                Address.filter(id=address_id, customer_id=customer_id),
+                is_default=True,
+            )
+            if not chosen:
+                # Rolls back clearing the previous main address
+                raise DoesNotExist("Address not Found")
+        return SingleAddressModel(**dict(chosen[0]))
+    except Exception as e:
+        logger.error(str(e))
+        raise HTTPException(status_code=404, detail=str(e))
 
 
 @router.post("/update/{customer_id}/{address_id}", tags=["address"])
 async def update_address(customer_id: str, address_id: int, address: AddressCreate):
-    exists = await does_customer_exist(customer_id)
-    if exists:
-        try:
-            address_to_update = await Address.get(id=address_id)
-
-            if (AddressCreate(**dict(address_to_update))).model_dump(
-                exclude_unset=True, exclude_none=True
-            ) == address.model_dump(exclude_unset=True, exclude_none=True):
-                return JSONResponse(
-                    status_code=status.HTTP_204_NO_CONTENT,
-                    content={"detail": "No changes were made"},
-                )
-
-            fields_to_update = [
-                "first_name",
-                "last_name",
-                "street",
-                "street2",
-                "city",
-                "state",
-                "zip_code",
-            ]
-            for field in fields_to_update:
-                if getattr(address_to_update, field) != getattr(address, field):
-                    setattr(address_to_update, field, getattr(address, field))
-
-            await address_to_update.save()
-            updated_address = await Address.get(id=address_id)
-            return SingleAddressModel(**dict(updated_address))
-        except Exception as e:
-            logger.error(str(e))
-            raise HTTPException(status_code=404, detail=str(e))
-    else:
-        logger.error("Customer not found")
-        raise HTTPException(status_code=404, detail="Customer not Found")
+    fields = address.model_dump()
+    try:
+        updated = await update_returning(
+            Address.filter(changes(**fields), id=address_id, customer_id=customer_id),
+            **fields,
+        )
+        if updated:
+            return SingleAddressModel(**dict(updated[0]))
+    except Exception as e:
+        logger.error(str(e))
+        raise HTTPException(status_code=404, detail=str(e))
+
+    # Nothing was updated, either because the address is unchanged or because
+    # the customer has no such address
+    if not await Address.exists(id=address_id, customer_id=customer_id):
+        logger.error("Address not found")
+        raise HTTPException(status_code=404, detail="Address not Found")
+    return JSONResponse(
+        status_code=status.HTTP_204_NO_CONTENT,
+        content={"detail": "No changes were made"},
+    )
 
 
 @router.delete("/delete/{customer_id}/{address_id}")
 async def delete_selected_address(customer_id: str, address_id: int):
     try:
-        address = await Address.filter(id=address_id, customer_id=customer_id)
-        if address[0]:
-            await address[0].delete()
-            return True
-        else:
-            return False
+        deleted = await Address.filter(id=address_id, customer_id=customer_id).delete()
     except Exception as e:
         logger.error(str(e))
         raise HTTPException(status_code=404, detail=str(e))
+    if not deleted:
+        logger.error("Address not found")
+        raise HTTPException(status_code=404, detail="Address not Found")
+    return True
 
 
 @router.get("/isMain/{customer_id}/{address_id}")
@@ -1,7 +1,11 @@
-from db.schema import Category
+from api.responses import ModelResponse, dump
+from cache import catalog_cache
+from db.schema import Category, slugify
 from fastapi import APIRouter, HTTPException
 from loguru import logger
+from tortoise.exceptions import IntegrityError
 
+from .directory import get_category, publish_categories_changed
 from .models import CategoryCreate, CategoryModel, CategoryUpdate
 
 router = APIRouter()
@@ -9,10 +13,13 @@ router = APIRouter()
 
 @router.get("", response_model=list[CategoryModel])
 async def get_all_categories():
-    try:
+    async def load():
         categories = await Category.all().order_by("id")
-        logger.info("Retrieved all categories")
-        return [CategoryModel(**dict(category)) for category in categories]
+        logger.debug("Loaded {} categories", len(categories))
+        return dump([CategoryModel(**dict(category)) for category in categories])
+
+    try:
+        return ModelResponse(await catalog_cache.get_or_load("category:all", load))
     except Exception as e:
         logger.error(str(e))
         raise HTTPException(status_code=404, detail="Something went wrong")
@@ -20,44 +27,49 @@ async def get_all_categories():
 
 @router.get("/{category_name}", response_model=bool)
 async def does_category_exist(category_name: str):
-    category_name = category_name.lower().replace("-", " ")
+    return get_category(slugify(category_name)) is not None
+
+
+async def announce_change(*prefixes: str):
+    """Drop the cached ``prefixes`` and reload the category directory in
+    every worker. The change is committed by then, so a failure here is only
+    logged: the cache TTL and the periodic directory refresh catch up."""
     try:
-        category = await Category.filter(name=category_name)
-        if category:
-            return True
-        else:
-            return False
-    except Exception:
-        logger.error(f"Category: {category_name} does not exist")
-        return False
+        await catalog_cache.invalidate(*prefixes)
+        await publish_categories_changed()
+    except Exception as e:
+        logger.error(f"Could not announce the category change: {e}")
 
 
 @router.post("/create", response_model=CategoryModel)
 async def create_category(category: CategoryCreate):
+    # The unique slug, not a lookup beforehand, keeps concurrent requests
+    # from creating the same category twice
     try:
-        exists = await does_category_exist(category.name)
-        if not exists:
-            new_category = await Category.create(
-                name=category.name, description=category.description
-            )
-
-            logger.info(f"{new_category.name} category created successfully")
-            return CategoryModel(**dict(new_category))
-        else:
-            logger.info(f"Category with that name ({category.name}) already exists")
-            raise HTTPException(
-                status_code=403, detail=f"Category {category.name} already exists"
-            )
-
+        new_category = await Category.create(
+            name=category.name,
+            slug=slugify(category.name),
+            description=category.description,
+        )
+    except IntegrityError:
+        logger.info(f"Category with that name ({category.name}) already exists")
+        raise HTTPException(
+            status_code=403, detail=f"Category {category.name} already exists"
+        )
     except Exception as e:
         logger.error(str(e))
         raise HTTPException(status_code=404, detail=str(e))
 
+    await announce_change("category")
+    logger.info(f"{new_category.name} category created successfully")
+    return CategoryModel(**dict(new_category))
+
 
 @router.delete("/delete/{category_id}")
 async def delete_category(category_id: int):
     try:
         await Category.get(id=category_id).delete()
+        await announce_change("category", "product")
         return {"message": "Category deleted successfully"}
     except Exception as e:
         logger.error(str(e))
@@ -66,7 +78,8 @@ async def delete_category(category_id: int):
 
 @router.put("/update/{category_id}")
 async def update_category(category_id: int, category: CategoryUpdate):
-    category.name = category.name.lower()
+    if category.name:
+        category.name = category.name.lower()
     try:
         categoryFound = await Category.get(id=category_id)
         if not categoryFound:
@@ -75,11 +88,14 @@ async def update_category(category_id: int, category: CategoryUpdate):
         attributesToUpdate = {
             attr: value for attr, value in category if value is not None and value != ""
         }
+        if "name" in attributesToUpdate:
+            attributesToUpdate["slug"] = slugify(attributesToUpdate["name"])
         await Category.get(id=category_id).update(**attributesToUpdate)
         updated_category = await Category.get(id=category_id)
         await updated_category.save()
+        await announce_change("category", "product")
 
-        logger.info(f"Category {update_category.name} has been updated")
+        logger.info(f"Category {updated_category.name} has been updated")
         return {
             "message": "Category updated successfully",
         }
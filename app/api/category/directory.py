@@ -0,0 +1,79 @@
+import asyncio
+
+from db import notify
+from db.schema import Category
+from loguru import logger
+from settings import settings
+from tortoise.functions import Count
+
+CATEGORIES_CHANGED = "categories_changed"
+
+# slug -> id, name, slug and product_count of every category
+_directory: dict[str, dict] = {}
+# Loads are numbered so an older one finishing last cannot win
+_started = 0
+_applied = 0
+_reload: asyncio.Task | None = None
+_refresher: asyncio.Task | None = None
+
+
+def get_category(slug: str):
+    """The category with ``slug``, or None, without a database round trip."""
+    return _directory.get(slug)
+
+
+async def load_directory():
+    global _directory, _started, _applied
+    _started += 1
+    load = _started
+    categories = await Category.annotate(product_count=Count("products")).values(
+        "id", "name", "slug", "product_count"
+    )
+    if load > _applied:
+        _applied = load
+        _directory = {category["slug"]: category for category in categories}
+
+
+def _reload_directory():
+    global _reload
+    _reload = asyncio.create_task(load_directory())
+
+
+def _on_categories_changed(payload: str):
+    _reload_directory()
+
+
+notify.subscribe(CATEGORIES_CHANGED, _on_categories_changed)
+# Changes made while the listener was not connected were never notified
+notify.on_listening(_reload_directory)
+
+
+async def publish_categories_changed():
+    """Reload the directory in every worker, in this one before returning."""
+    await notify.publish(CATEGORIES_CHANGED)
+    if _reload:
+        await _reload
+
+
+async def _refresh_periodically(interval: float):
+    while True:
+        await asyncio.sleep(interval)
+        try:
+            await load_directory()
+        except Exception as e:
+            logger.error(f"Category directory refresh failed: {e}")
+
+
+def start_refresh():
+    """Reload the directory every CATEGORY_DIRECTORY_REFRESH seconds, a
+    backstop for any change notification that never arrived."""
+    global _refresher
+    if settings.CATEGORY_DIRECTORY_REFRESH > 0:
+        _refresher = asyncio.create_task(
+            _refresh_periodically(settings.CATEGORY_DIRECTORY_REFRESH)
+        )
+
+
+def stop_refresh():
+    if _refresher:
+        _refresher.cancel()
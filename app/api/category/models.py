@@ -16,6 +16,7 @@ class CategoryUpdate(BaseModel):
 class CategoryModel(BaseModel):
     id: int
     name: str
+    slug: str
     description: str
     created_at: datetime
     updated_at: datetime
@@ -1,10 +1,13 @@
 from api.address.models import AddressCreate, AddressModel, SingleAddressModel
+from db.returning import changes, update_returning
 from db.schema import Address, Customer
 from fastapi import APIRouter, HTTPException, status
 from fastapi.responses import JSONResponse
+from log import sample
 from loguru import logger
+from tortoise.exceptions import IntegrityError
 
-from .models import CustomerCreate, CustomerModel
+from .models import CustomerCreate, CustomerModel, CustomerName
 
 router = APIRouter()
 
@@ -12,30 +15,22 @@ router = APIRouter()
 # Profile Endpoints
 @router.get("/exists/{customer_id}", response_model=bool, tags=["customer"])
 async def does_customer_exist(customer_id: str):
-    try:
-        customer = await Customer.get(id=customer_id)
-        if customer:
-            return True
-        else:
-            return False
-    except Exception:
-        return False
+    return await Customer.exists(id=customer_id)
 
 
 @router.get("/{customer_id}", tags=["customer"])
 async def get_customer(customer_id: str):
-    try:
-        customer = await Customer.get(id=customer_id)
-        if not customer:
-            raise HTTPException(status_code=404, detail="Customer not Found")
-    except Exception:
+    # The customer comes joined to each of its addresses, and every customer
+    # has a main address, so no rows means no customer
+    addresses = await Address.filter(customer_id=customer_id).select_related("customer")
+    if not addresses:
         logger.error("Customer Not Found")
         raise HTTPException(status_code=404, detail="Customer not Found")
 
-    logger.info(f"Retrieved {customer_id}'s profile")
     try:
-        addresses = await customer.addresses.all()
-        logger.info(f"Retrieved {customer_id}'s addresses")
+        customer = addresses[0].customer
+        if sample("customer:profile"):
+            logger.debug("Retrieved profile and addresses of {}", customer_id)
         other_addresses = []
         for address in addresses:
             if address.is_default:
@@ -56,11 +51,14 @@ async def get_customer(customer_id: str):
 
 @router.post("/create", response_model=CustomerModel, tags=["customer"])
 async def create_customer(customer: CustomerCreate, address: AddressCreate):
-    customerExists = await does_customer_exist(customer.id)
-    if customerExists:
-        raise HTTPException(status_code=404, detail="Customer already exists")
     try:
         customer = await Customer.create(**customer.dict())
+    except IntegrityError:
+        raise HTTPException(status_code=404, detail="Customer already exists")
+    except Exception as e:
+        logger.error(str(e))
+        raise HTTPException(status_code=404, detail=str(e))
+    try:
         address = await Address.create(
             **address.model_dump(), customer_id=customer.id, is_default=True
         )
@@ -77,48 +75,39 @@ async def create_customer(customer: CustomerCreate, address: AddressCreate):
 
 
 @router.post("/editName/{customer_id}", tags=["customer"])
-async def edit_customer_name(customer_id: str, customer_name: dict):
-    customerExists = await does_customer_exist(customer_id)
-    if not customerExists:
-        raise HTTPException(status_code=404, detail="Customer does not exist")
+async def edit_customer_name(customer_id: str, customer_name: CustomerName):
+    name = dict(customer_name)
     try:
-        customer = await Customer.get(id=customer_id)
-        if (
-            customer.first_name == customer_name["first_name"]
-            and customer.last_name == customer_name["last_name"]
-        ):
-            return JSONResponse(
-                status_code=status.HTTP_204_NO_CONTENT,
-                content={"detail": "No changes were made"},
-            )
-
-        if customer.first_name != customer_name["first_name"]:
-            customer.first_name = customer_name["first_name"]
-
-        if customer.last_name != customer_name["last_name"]:
-            customer.last_name = customer_name["last_name"]
-
-        await customer.save()
-
-        updated_customer = await Customer.get(id=customer_id)
-        return {
-            "first_name": updated_customer.first_name,
-            "last_name": updated_customer.last_name,
-        }
+        updated = await update_returning(
+            Customer.filter(changes(**name), id=customer_id), **name
+        )
+        if updated:
+            return {
+                "first_name": updated[0].first_name,
+                "last_name": updated[0].last_name,
+            }
     except Exception as e:
         logger.error(str(e))
         raise HTTPException(status_code=404, detail=str(e))
 
+    # Nothing was updated, either because the name is unchanged or because
+    # there is no such customer
+    if not await does_customer_exist(customer_id):
+        raise HTTPException(status_code=404, detail="Customer does not exist")
+    return JSONResponse(
+        status_code=status.HTTP_204_NO_CONTENT,
+        content={"detail": "No changes were made"},
+    )
+
 
 @router.delete("/delete/{customer_id}")
 async def delete_customer(customer_id: str):
     try:
-        customer = await Customer.get(id=customer_id)
-        if customer:
-            await customer.delete()
-            return True
-        else:
-            return False
+        deleted = await Customer.filter(id=customer_id).delete()
     except Exception as e:
         logger.error(str(e))
         raise HTTPException(status_code=404, detail=str(e))
+    if not deleted:
+        logger.error("Customer not Found")
+        raise HTTPException(status_code=404, detail="Customer not Found")
+    return True
@@ -18,3 +18,8 @@ class CustomerCreate(BaseModel):
     first_name: str
     last_name: str
     email: str
+
+
+class CustomerName(BaseModel):
+    first_name: str
+    last_name: str
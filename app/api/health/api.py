@@ -0,0 +1,9 @@
+from db.pool import pool_stats
+from fastapi import APIRouter
+
+router = APIRouter()
+
+
+@router.get("/pool")
+async def get_pool_stats():
+    return pool_stats()
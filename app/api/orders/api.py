@@ -1,28 +1,50 @@
+import asyncio
 import json
-import os
 from datetime import datetime, timedelta, timezone
 
 import stripe
-from db.schema import Address, Category, Customer, Order, OrderItem, Product
-from fastapi import APIRouter, HTTPException, Request
+from api.pagination import after_cursor, encode_cursor
+from api.responses import ModelResponse
+from db.schema import Customer, Order, Product
+from fastapi import APIRouter, Depends, HTTPException, Query, Request
+from log import sample
 from loguru import logger
+from payments import get_payment_client
+from settings import settings
+from tortoise.exceptions import DoesNotExist
 
-from .models import CheckoutModel, OrderItemModel, OrderModel
+from .inbox import HANDLERS, inbox_worker, store_event
+from .models import CheckoutModel, OrderItemModel, OrderModel, OrderPageModel
+from .waiters import order_waiter
 
 router = APIRouter()
 
 
 @router.post("/checkout/session")
-async def checkout(customer_email: str, data: CheckoutModel):
-    stripe.api_key = os.environ["STRIPE_SECRET_KEY"]
-    STRIPE_URL = os.environ["STRIPE_URL"]
+async def checkout(
+    customer_email: str,
+    data: CheckoutModel,
+    payment_client=Depends(get_payment_client),
+):
+    product_ids = [item.product_id for item in data.cartItems]
+    products = {
+        product.id: product
+        for product in await Product.filter(id__in=product_ids).only(
+            "id", "name", "price"
+        )
+    }
 
     line_items = []
     taxes_and_fees = 0
     for item in data.cartItems:
-        product = await Product.get(id=item["product_id"])
+        product = products.get(item.product_id)
+        if product is None:
+            logger.error(f"Product {item.product_id} not found")
+            raise HTTPException(
+                status_code=404, detail=f"Product {item.product_id} not found"
+            )
         unit_amount = int(product.price * 100)
-        taxes_and_fees += unit_amount * item["quantity"]
+        taxes_and_fees += unit_amount * item.quantity
         line_items.append(
             {
                 "price_data": {
@@ -30,10 +52,9 @@ async def checkout(customer_email: str, data: CheckoutModel):
                     "product_data": {"name": product.name},
                     "unit_amount": unit_amount,
                 },
-                "quantity": item["quantity"],
+                "quantity": item.quantity,
             }
         )
-        logger.info(f"{item} added to line_items for stripe")
     line_items.append(
         {
             "price_data": {
@@ -44,40 +65,40 @@ async def checkout(customer_email: str, data: CheckoutModel):
             "quantity": 1,
         }
     )
-    logger.info(f"{taxes_and_fees} added to line_items for stripe")
+    if sample("order:checkout"):
+        logger.debug("Creating checkout session with {} items", len(line_items))
     try:
-        session = stripe.checkout.Session.create(
+        session = await payment_client.create_checkout_session(
             payment_method_types=["card"],
             mode="payment",
             line_items=line_items,
             customer_email=customer_email,
-            success_url=f"{STRIPE_URL}/success",
-            cancel_url=f"{STRIPE_URL}/cart",
+            success_url=f"{settings.STRIPE_URL}/success",
+            cancel_url=f"{settings.STRIPE_URL}/cart",
             metadata={
-                "cartItems": json.dumps(data.cartItems),
+                "cartItems": json.dumps([item.model_dump() for item in data.cartItems]),
                 "address_id": data.address_id,
             },
         )
 
         return session
+    except asyncio.TimeoutError:
+        logger.error("Timed out creating checkout session")
+        raise HTTPException(status_code=504, detail="Payment provider timed out")
     except Exception as e:
         logger.error(str(e), "error 404")
         raise HTTPException(status_code=404, detail=str(e))
 
 
 @router.post("/webhook")
-async def webhook(request: Request):
+async def webhook(request: Request, payment_client=Depends(get_payment_client)):
     event = None
     payload = await request.body()
-    logger.info("Payload found")
-    sig_header = request.headers["stripe-signature"]
+    sig_header = request.headers.get("stripe-signature")
 
     try:
         payload = payload.decode("utf-8")
-        logger.info("Payload decoded")
-        event = stripe.Webhook.construct_event(
-            payload, sig_header, os.environ["STRIPE_WEBHOOK_SECRET"]
-        )
+        event = payment_client.construct_event(payload, sig_header)
     except ValueError as e:
         # Invalid payload
         logger.error(str(e))
@@ -87,132 +108,124 @@ async def webhook(request: Request):
         logger.error(str(e))
         raise e
 
-    # Handle the event
-    if event["type"] == "checkout.session.completed":
-        logger.info("Checkout session completed")
-        customer_email = event.data.object.customer_email
-        cartItems = json.loads(event.data.object.metadata["cartItems"])
-        customer = await Customer.get(email=customer_email)
-
-        try:
-            order = await Order.create(
-                customer_id=customer.id,
-                total_price=event.data.object.amount_total,
-                shipAddress_id=event.data.object.metadata["address_id"],
-                shippedDate=None,
-                status=0,
-            )
-            logger.info(
-                f"Order created with id {order.id} for customer with email {customer.email}"
-            )
-
-            for item in cartItems:
-                product = await Product.get(id=item["product_id"])
-                logger.info(f"Product with {item['product_id']} found")
-                product.quantity -= item["quantity"]
-                logger.info("Removed quantity for product")
-                await product.save()
-                orderItem = await OrderItem.create(
-                    order_id=order.id,
-                    product_id=product.id,
-                    quantity=item["quantity"],
-                    price=product.price * item["quantity"],
-                )
-                logger.info(f"Order item created {orderItem}")
-        except Exception as e:
-            logger.error(str(e))
-            raise HTTPException(status_code=404, detail=str(e))
+    # Events are only stored here; the inbox worker creates the order, so the
+    # reply to Stripe does not wait on it and redeliveries are ignored.
+    if event["type"] in HANDLERS:
+        await store_event(event["id"], event["type"], json.loads(payload))
+        inbox_worker.wake()
+        logger.info(f"Stored {event['type']} event {event['id']}")
 
     return {"success": True}
 
 
+def build_order_model(order: Order):
+    address = order.shipAddress
+    return OrderModel(
+        id=order.id,
+        subtotal=order.total_price,
+        orderDate=(order.orderDate).strftime("%B %d, %Y"),
+        status=order.status,
+        full_name=f"{address.first_name} {address.last_name}",
+        shipAddress=address.full_street(),
+        orderItems=[
+            OrderItemModel(
+                id=item.product.id,
+                category=item.product.category.name,
+                name=item.product.name,
+                image=item.product.image,
+                brand=item.product.brand,
+                price=item.product.price,
+                quantity=item.quantity,
+                subtotal=item.price,
+            )
+            for item in order.orderItems
+        ],
+    )
+
+
 @router.get("/{customer_id}")
-async def get_orders(customer_id: str):
+async def get_orders(
+    customer_id: str,
+    limit: int | None = Query(None, ge=1, le=100),
+    cursor: str | None = None,
+):
+    """Newest orders first. With ``limit`` set, pass ``next_cursor`` back as
+    ``cursor`` to get the following page."""
     try:
-        customer = await Customer.get(id=customer_id)
-        orders = await customer.orders.all()
-        response = []
-        for order in orders:
-            address = await Address.get(id=order.shipAddress_id)
-            full_name = f"{address.first_name} {address.last_name}"
-            shipAddress = address.full_street()
-            order_date = (order.orderDate).strftime("%B %d, %Y")
-
-            order_items = await order.orderItems.all()
-            orderItemsModelList = []
-            for item in order_items:
-                product = await Product.get(id=item.product_id)
-                category = await Category.get(id=product.category_id)
-
-                orderItemsModelList.append(
-                    OrderItemModel(
-                        id=product.id,
-                        category=category.name,
-                        name=product.name,
-                        image=product.image,
-                        brand=product.brand,
-                        price=product.price,
-                        quantity=item.quantity,
-                        subtotal=item.price,
-                    )
-                )
-
-            response.append(
-                OrderModel(
-                    id=order.id,
-                    subtotal=order.total_price,
-                    orderDate=order_date,
-                    status=order.status,
-                    full_name=full_name,
-                    shipAddress=shipAddress,
-                    orderItems=orderItemsModelList,
-                )
-            )
-        return response
+        if not await Customer.exists(id=customer_id):
+            raise DoesNotExist("Customer not Found")
+
+        orders = Order.filter(customer_id=customer_id)
+        if cursor is not None:
+            orders = orders.filter(after_cursor(cursor, "orderDate"))
+        orders = (
+            orders.order_by("-orderDate", "-id")
+            .select_related("shipAddress")
+            .prefetch_related("orderItems__product__category")
+        )
+        if limit is not None:
+            orders = orders.limit(limit + 1)
+        orders = await orders
+
+        next_cursor = None
+        if limit is not None and len(orders) > limit:
+            orders = orders[:limit]
+            next_cursor = encode_cursor(orders[-1].orderDate, orders[-1].id)
+
+        response = [build_order_model(order) for order in orders]
+        if limit is None:
+            return ModelResponse(response)
+        return ModelResponse(OrderPageModel(orders=response, next_cursor=next_cursor))
     except Exception as e:
         logger.error(str(e))
         raise HTTPException(status_code=404, detail=str(e))
 
 
+RECENT_ORDER_WINDOW = timedelta(minutes=2)
+
+
+async def get_recent_order(customer_id: str):
+    return (
+        await Order.filter(
+            customer_id=customer_id,
+            orderDate__gte=datetime.now(timezone.utc) - RECENT_ORDER_WINDOW,
+        )
+        .order_by("-orderDate")
+        .select_related("shipAddress")
+        .prefetch_related("orderItems__product__category")
+        .first()
+    )
+
+
 @router.get("/recent/{customer_id}")
 async def is_recent_order_placed(customer_id: str):
     try:
-        orders = await Order.filter(customer_id=customer_id).order_by("-orderDate")
-        order = orders[0]
-        address = await Address.get(id=order.shipAddress_id)
-        recent_time_window = datetime.now(timezone.utc) - orders[0].orderDate
-
-        if recent_time_window < timedelta(minutes=2):
-            order_items = await order.orderItems.all()
-            orderItemsModelList = []
-            for item in order_items:
-                product = await Product.get(id=item.product_id)
-                category = await Category.get(id=product.category_id)
-
-                orderItemsModelList.append(
-                    OrderItemModel(
-                        id=product.id,
-                        category=category.name,
-                        name=product.name,
-                        image=product.image,
-                        brand=product.brand,
-                        price=product.price,
-                        quantity=item.quantity,
-                        subtotal=item.price,
-                    )
-                )
-
-            return OrderModel(
-                id=order.id,
-                subtotal=order.total_price,
-                orderDate=(order.orderDate).strftime("%B %d, %Y"),
-                status=order.status,
-                full_name=f"{address.first_name} {address.last_name}",
-                shipAddress=address.full_street(),
-                orderItems=orderItemsModelList,
-            )
-        else:
-            return False
+        order = await get_recent_order(customer_id)
+        return ModelResponse(build_order_model(order) if order else False)
+    except Exception as e:
+        logger.error(str(e))
+        raise HTTPException(status_code=404, detail=str(e))
+
 
-    except Exception:
-        return False
+@router.get("/recent/{customer_id}/wait")
+async def wait_for_recent_order(
+    customer_id: str, timeout: float = Query(25, gt=0, le=60)
+):
+    """Long-poll version of ``/recent/{customer_id}``: answers as soon as the
+    customer's order is committed, or with ``False`` after ``timeout``
+    seconds."""
+    try:
+        # Wait on the event before checking so an order committed in between
+        # still wakes this request.
+        with order_waiter(customer_id) as order_placed:
+            order = await get_recent_order(customer_id)
+            if order is None:
+                try:
+                    await asyncio.wait_for(order_placed.wait(), timeout=timeout)
+                except asyncio.TimeoutError:
+                    return False
+                order = await get_recent_order(customer_id)
+        return ModelResponse(build_order_model(order) if order else False)
+    except Exception as e:
+        logger.error(str(e))
+        raise HTTPException(status_code=404, detail=str(e))
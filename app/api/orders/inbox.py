@@ -0,0 +1,210 @@
+import asyncio
+from datetime import datetime, timedelta, timezone
+
+from api.product.models import CartLineModel
+from cache import catalog_cache
+from db.schema import (
+    Customer,
+    Order,
+    OrderItem,
+    Product,
+    WebhookEvent,
+    WebhookEventStatus,
+)
+from loguru import logger
+from pydantic import TypeAdapter, ValidationError
+from tortoise.expressions import F
+from tortoise.transactions import in_transaction
+
+from .waiters import publish_order_placed
+
+POLL_INTERVAL = 5
+MAX_ATTEMPTS = 8
+# How long a worker owns a claimed event before another worker may retry it
+LEASE = timedelta(minutes=5)
+
+
+class OutOfStock(Exception):
+    """An order that cannot be filled. Retrying cannot fix it, so its event
+    fails at once."""
+
+
+# Quantities must be positive, a negative one would add stock
+CART_ITEMS = TypeAdapter(list[CartLineModel])
+
+
+def retry_delay(attempts: int):
+    return timedelta(seconds=min(5 * 2**attempts, 3600))
+
+
+async def materialize_order(event: WebhookEvent):
+    session = event.payload["data"]["object"]
+    cartItems = CART_ITEMS.validate_json(session["metadata"]["cartItems"])
+    customer = await Customer.get(email=session["customer_email"])
+
+    # The order, its items, the stock decrements and marking the event as
+    # processed commit together, so a redelivered event can never create a
+    # second order. Each decrement is a conditional UPDATE so concurrent
+    # orders can neither lose an update nor oversell. Products are updated
+    # in id order so two orders sharing products lock them in the same order
+    # and cannot deadlock.
+    async with in_transaction():
+        order = await Order.create(
+            customer_id=customer.id,
+            total_price=session["amount_total"],
+            shipAddress_id=session["metadata"]["address_id"],
+            shippedDate=None,
+            status=0,
+        )
+        logger.info(
+            f"Order created with id {order.id} for customer with email {customer.email}"
+        )
+
+        product_ids = [item.product_id for item in cartItems]
+        prices = dict(
+            await Product.filter(id__in=product_ids).values_list("id", "price")
+        )
+        for item in sorted(cartItems, key=lambda item: item.product_id):
+            updated = await Product.filter(
+                id=item.product_id, quantity__gte=item.quantity
+            ).update(quantity=F("quantity") - item.quantity)
+            if not updated:
+                raise OutOfStock(f"Not enough stock for product {item.product_id}")
+
+        await OrderItem.bulk_create(
+            [
+                OrderItem(
+                    order_id=order.id,
+                    product_id=item.product_id,
+                    quantity=item.quantity,
+                    price=prices[item.product_id] * item.quantity,
+                )
+                for item in cartItems
+            ]
+        )
+        logger.debug("Created {} items for order {}", len(cartItems), order.id)
+        await mark_processed(event)
+
+    await publish_order_placed(customer.id)
+    await catalog_cache.invalidate(
+        "product:list",
+        *(f"product:id:{item['product_id']}" for item in cartItems),
+    )
+
+
+HANDLERS = {"checkout.session.completed": materialize_order}
+
+
+async def mark_processed(event: WebhookEvent):
+    await WebhookEvent.filter(id=event.id).update(
+        status=WebhookEventStatus.PROCESSED,
+        processed_at=datetime.now(timezone.utc),
+        last_error=None,
+    )
+
+
+async def store_event(event_id: str, event_type: str, payload: dict):
+    """Add an event to the inbox. Redelivered events are ignored."""
+    await WebhookEvent.bulk_create(
+        [
+            WebhookEvent(
+                id=event_id,
+                type=event_type,
+                payload=payload,
+                next_attempt_at=datetime.now(timezone.utc),
+            )
+        ],
+        ignore_conflicts=True,
+    )
+
+
+async def claim_next_event():
+    """Lease the next due event. The conditional UPDATE makes sure only one
+    worker, in any process, gets to handle it."""
+    now = datetime.now(timezone.utc)
+    candidates = (
+        await WebhookEvent.filter(
+            status=WebhookEventStatus.PENDING, next_attempt_at__lte=now
+        )
+        .order_by("next_attempt_at")
+        .limit(10)
+    )
+    for event in candidates:
+        claimed = await WebhookEvent.filter(
+            id=event.id, status=WebhookEventStatus.PENDING, next_attempt_at__lte=now
+        ).update(next_attempt_at=now + LEASE)
+        if claimed:
+            return event
+    return None
+
+
+async def process_event(event: WebhookEvent):
+    try:
+        await HANDLERS[event.type](event)
+        logger.info(f"Processed {event.type} event {event.id}")
+    except Exception as e:
+        attempts = event.attempts + 1
+        if isinstance(e, (OutOfStock, ValidationError)):
+            # The customer has paid for an order that was not created
+            status = WebhookEventStatus.FAILED
+            logger.error(
+                f"Event {event.id} failed for good, the payment needs a refund: {e}"
+            )
+        elif attempts >= MAX_ATTEMPTS:
+            status = WebhookEventStatus.FAILED
+            logger.error(
+                f"Giving up on event {event.id} after {attempts} attempts: {e}"
+            )
+        else:
+            status = WebhookEventStatus.PENDING
+            logger.error(f"Event {event.id} failed, attempt {attempts}: {e}")
+        await WebhookEvent.filter(
+            id=event.id, status=WebhookEventStatus.PENDING
+        ).update(
+            status=status,
+            attempts=attempts,
+            last_error=str(e),
+            next_attempt_at=datetime.now(timezone.utc) + retry_delay(attempts),
+        )
+
+
+class InboxWorker:
+    """Drains the webhook inbox in the background of each app process."""
+
+    def __init__(self):
+        self._wakeup = asyncio.Event()
+        self._stopping = False
+        self._task: asyncio.Task | None = None
+
+    def start(self):
+        self._stopping = False
+        self._task = asyncio.create_task(self._run())
+
+    def wake(self):
+        self._wakeup.set()
+
+    async def stop(self):
+        """Let the event being processed finish, then stop."""
+        self._stopping = True
+        self._wakeup.set()
+        if self._task:
+            await self._task
+
+    async def drain(self):
+        while not self._stopping and (event := await claim_next_event()):
+            await process_event(event)
+
+    async def _run(self):
+        while not self._stopping:
+            self._wakeup.clear()
+            try:
+                await self.drain()
+            except Exception as e:
+                logger.error(f"Inbox worker error: {e}")
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout=POLL_INTERVAL)
+            except asyncio.TimeoutError:
+                pass
+
+
+inbox_worker = InboxWorker()
@@ -1,5 +1,6 @@
 from datetime import datetime
 
+from api.product.models import CartLineModel
 from pydantic import BaseModel
 
 
@@ -25,6 +26,11 @@ class OrderModel(BaseModel):
     orderDate: str
 
 
+class OrderPageModel(BaseModel):
+    orders: list[OrderModel]
+    next_cursor: str | None
+
+
 class CheckoutModel(BaseModel):
     address_id: int
-    cartItems: list[dict]
+    cartItems: list[CartLineModel]
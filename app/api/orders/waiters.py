@@ -0,0 +1,34 @@
+import asyncio
+from contextlib import contextmanager
+
+from db import notify
+
+ORDER_PLACED = "order_placed"
+
+_waiters: dict[str, set[asyncio.Event]] = {}
+
+
+def _on_order_placed(customer_id: str):
+    for event in _waiters.get(customer_id, ()):
+        event.set()
+
+
+notify.subscribe(ORDER_PLACED, _on_order_placed)
+
+
+@contextmanager
+def order_waiter(customer_id: str):
+    """Event that is set when an order for ``customer_id`` is committed by
+    any worker."""
+    event = asyncio.Event()
+    _waiters.setdefault(customer_id, set()).add(event)
+    try:
+        yield event
+    finally:
+        _waiters[customer_id].discard(event)
+        if not _waiters[customer_id]:
+            del _waiters[customer_id]
+
+
+async def publish_order_placed(customer_id: str):
+    await notify.publish(ORDER_PLACED, customer_id)
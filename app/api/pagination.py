@@ -0,0 +1,19 @@
+from datetime import datetime
+
+from tortoise.expressions import Q
+
+
+def encode_cursor(timestamp: datetime, id: int):
+    """Cursor pointing after a row of a listing ordered newest first.
+
+    The id breaks ties between rows created at the same instant, which a
+    cursor of the timestamp alone would skip.
+    """
+    return f"{timestamp.isoformat()}_{id}"
+
+
+def after_cursor(cursor: str, field: str):
+    """Filter for the rows after ``cursor`` in ``-field, -id`` order."""
+    timestamp, _, id = cursor.rpartition("_")
+    timestamp, id = datetime.fromisoformat(timestamp), int(id)
+    return Q(**{f"{field}__lt": timestamp}) | Q(**{field: timestamp, "id__lt": id})
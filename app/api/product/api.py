@@ -1,62 +1,142 @@
 import random
 
-from db.schema import Category, Product
-from fastapi import APIRouter, HTTPException
+from api.category.directory import get_category
+from api.responses import ModelResponse, dump
+from cache import catalog_cache
+from db import search
+from db.schema import Product, slugify
+from fastapi import APIRouter, HTTPException, Query
+from log import sample
 from loguru import logger
+from tortoise.expressions import Q
+from tortoise.functions import Max, Min
+from tortoise.queryset import QuerySet
 
-from .models import ProductModel, ReviewModel
+from .models import (
+    CartAvailabilityModel,
+    CartLineModel,
+    ProductModel,
+    ProductPageModel,
+    ProductSummaryModel,
+    ReviewModel,
+    UnavailableCartLineModel,
+)
 
 router = APIRouter()
 
 
 # Product Endpoints
-async def get_category_name(product: Product):
-    category = await product.category
-    return category.name
+def build_product_model(product: Product):
+    return ProductModel(
+        **dict(product),
+        category_name=product.category.name,
+        reviews=[ReviewModel(**dict(review)) for review in product.reviews],
+        rating=product.average_rating(),
+    )
 
 
-async def get_product_reviews(products: Product):
+def build_product_summary(product: Product):
+    return ProductSummaryModel(
+        **dict(product),
+        category_name=product.category.name,
+        rating=product.average_rating(),
+    )
+
+
+async def get_product_reviews(products: list[Product]):
+    # Categories and reviews for the whole batch are loaded with one query
+    # per relation instead of two queries per product.
+    products = list(products)
+    await Product.fetch_for_list(products, "category", "reviews")
     response = []
     for product in products:
-        category_name = await get_category_name(product)
-        reviews = await product.reviews.all()
-        if reviews:
-            total_rating = sum(review.rating for review in reviews)
-            rating = total_rating / len(reviews)
-        else:
-            rating = 0
-        response.append(
-            ProductModel(
-                **dict(product),
-                category_name=category_name,
-                reviews=[ReviewModel(**dict(review)) for review in reviews],
-                rating=rating,
-            )
-        )
-        logger.info(f"Retrieved product {product.name}")
+        response.append(build_product_model(product))
+    if sample("product:list"):
+        logger.debug("Retrieved {} products with reviews", len(response))
     return response
 
 
+async def build_product_listing(products: list[Product], reviews: bool):
+    if reviews:
+        return await get_product_reviews(products)
+    await Product.fetch_for_list(products, "category")
+    return [build_product_summary(product) for product in products]
+
+
+async def get_product_listing(
+    products: QuerySet[Product], limit: int | None, cursor: int | None, reviews: bool
+):
+    """Keyset paginated listing ordered by id.
+
+    Without ``limit`` the whole result set is returned as a plain list, as
+    before. With ``reviews=False`` products carry only their rating summary.
+    """
+    if cursor is not None:
+        products = products.filter(id__gt=cursor)
+    products = products.order_by("id")
+    if limit is not None:
+        products = products.limit(limit + 1)
+    products = await products
+
+    next_cursor = None
+    if limit is not None and len(products) > limit:
+        products = products[:limit]
+        next_cursor = products[-1].id
+
+    items = await build_product_listing(products, reviews)
+    if limit is None:
+        return items
+    return ProductPageModel(products=items, next_cursor=next_cursor)
+
+
 @router.get("/all")
-async def get_all_products():
+async def get_all_products(
+    limit: int | None = Query(None, ge=1, le=100),
+    cursor: int | None = None,
+    reviews: bool = True,
+):
+    async def load():
+        return dump(await get_product_listing(Product.all(), limit, cursor, reviews))
+
     try:
-        products = await Product.all().order_by("id")
-        logger.info(f"Retrieved {len(products)} products")
-        return await get_product_reviews(products)
+        return ModelResponse(
+            await catalog_cache.get_or_load(
+                f"product:list:all:{limit}:{cursor}:{reviews}", load
+            )
+        )
     except Exception as e:
         logger.error(str(e))
         raise HTTPException(status_code=404, detail=str(e))
 
 
 @router.get("/category/{category_name}")
-async def get_products_by_category(category_name: str):
-    category_name = category_name.lower().replace("-", " ")
-    try:
-        category = await Category.get(name=category_name)
-        products = await category.products.all()
+async def get_products_by_category(
+    category_name: str,
+    limit: int | None = Query(None, ge=1, le=100),
+    cursor: int | None = None,
+    reviews: bool = True,
+):
+    category = get_category(slugify(category_name))
+    if category is None:
+        logger.error(f"Category {category_name} does not exist")
+        raise HTTPException(
+            status_code=404, detail=f"Category {category_name} does not exist"
+        )
 
-        return await get_product_reviews(products)
+    async def load():
+        return dump(
+            await get_product_listing(
+                Product.filter(category_id=category["id"]), limit, cursor, reviews
+            )
+        )
 
+    try:
+        return ModelResponse(
+            await catalog_cache.get_or_load(
+                f"product:list:category:{category['slug']}:{limit}:{cursor}:{reviews}",
+                load,
+            )
+        )
     except Exception as e:
         logger.error(str(e))
         raise HTTPException(status_code=404, detail=str(e))
@@ -64,23 +144,18 @@ async def get_products_by_category(category_name: str):
 
 @router.get("/{product_id}")
 async def get_product_by_id(product_id: int):
-    try:
-        product = await Product.get(id=product_id)
-        category_name = await get_category_name(product)
-        reviews = await product.reviews.all()
-        random.shuffle(reviews)
-
-        if reviews:
-            total_rating = sum(review.rating for review in reviews)
-            rating = total_rating / len(reviews)
-        else:
-            rating = 0
+    async def load():
+        product = await Product.get(id=product_id).prefetch_related(
+            "category", "reviews"
+        )
+        return build_product_model(product)
 
-        return ProductModel(
-            **dict(product),
-            category_name=category_name,
-            reviews=[ReviewModel(**dict(review)) for review in reviews],
-            rating=rating,
+    try:
+        product = await catalog_cache.get_or_load(f"product:id:{product_id}", load)
+        return ModelResponse(
+            product.model_copy(
+                update={"reviews": random.sample(product.reviews, len(product.reviews))}
+            )
         )
     except Exception as e:
         logger.error(str(e))
@@ -100,26 +175,122 @@ async def can_add_to_cart(product_id: int, quantity: int):
         raise HTTPException(status_code=404, detail=str(e))
 
 
+@router.post("/cart", response_model=CartAvailabilityModel)
+async def can_checkout_cart(cart: list[CartLineModel]):
+    """Check the whole cart with one query. ``unavailable`` lists the lines
+    that cannot be filled along with the stock that is left."""
+    try:
+        requested = {}
+        for line in cart:
+            requested[line.product_id] = (
+                requested.get(line.product_id, 0) + line.quantity
+            )
+
+        products = await Product.filter(id__in=list(requested)).only(
+            "id", "price", "quantity"
+        )
+        stock = {product.id: product for product in products}
+
+        unavailable = [
+            UnavailableCartLineModel(
+                product_id=product_id,
+                quantity=stock[product_id].quantity if product_id in stock else 0,
+            )
+            for product_id, quantity in requested.items()
+            if product_id not in stock or quantity > stock[product_id].quantity
+        ]
+        return CartAvailabilityModel(
+            can_checkout=not unavailable,
+            prices={product.id: product.price for product in products},
+            unavailable=unavailable,
+        )
+    except Exception as e:
+        logger.info(str(e))
+        raise HTTPException(status_code=404, detail=str(e))
+
+
 @router.get("/search/{query}")
-async def search_for_products(query: str):
+async def search_for_products(
+    query: str,
+    limit: int | None = Query(None, ge=1, le=100),
+    cursor: int | None = None,
+    reviews: bool = True,
+):
+    """Products ranked by relevance to ``query``.
+
+    Results are ordered by rank rather than id, so ``cursor`` here is the
+    position in the ranked results at which the page starts.
+    """
     try:
-        productsByName = await Product.filter(name__icontains=query)
-        productsByBrand = await Product.filter(brand__icontains=query)
-        products = set(productsByName + productsByBrand)
+        if not search.is_supported():
+            products = Product.filter(
+                Q(name__icontains=query) | Q(brand__icontains=query)
+            )
+            return ModelResponse(
+                await get_product_listing(products, limit, cursor, reviews)
+            )
 
-        return await get_product_reviews(products)
+        offset = cursor or 0
+        ids = await search.search_product_ids(
+            query, None if limit is None else limit + 1, offset
+        )
+        next_cursor = None
+        if limit is not None and len(ids) > limit:
+            ids = ids[:limit]
+            next_cursor = offset + limit
+
+        position = {product_id: index for index, product_id in enumerate(ids)}
+        products = await Product.filter(id__in=ids)
+        products.sort(key=lambda product: position[product.id])
+
+        items = await build_product_listing(products, reviews)
+        if limit is None:
+            return ModelResponse(items)
+        return ModelResponse(ProductPageModel(products=items, next_cursor=next_cursor))
     except Exception as e:
         logger.error(str(e))
         raise HTTPException(status_code=404, detail=str(e))
 
 
+async def sample_products(count: int):
+    """``count`` products picked at random, or all of them if there are fewer.
+
+    Ids are drawn between the lowest and highest one and looked up by
+    primary key, which unlike ordering by ``RANDOM()`` does not read the
+    whole table. More ids than needed are drawn to make up for the ones of
+    deleted products.
+    """
+    bounds = (
+        await Product.annotate(low=Min("id"), high=Max("id"))
+        .first()
+        .values("low", "high")
+    )
+    if not bounds or bounds["low"] is None:
+        return []
+    ids = range(bounds["low"], bounds["high"] + 1)
+    products = {}
+    for _ in range(3):
+        draw = random.sample(ids, min(len(ids), 4 * count))
+        for product in await Product.filter(id__in=draw):
+            products[product.id] = product
+        if len(products) >= count or len(draw) == len(ids):
+            break
+    else:
+        # Most of the id range is deleted, take the missing ones in id order
+        products.update(
+            (product.id, product)
+            for product in await Product.exclude(id__in=list(products)).limit(
+                count - len(products)
+            )
+        )
+    return random.sample(list(products.values()), min(count, len(products)))
+
+
 @router.get("/random/roulette", response_model=list[ProductModel])
 async def get_four_random_products():
     try:
-        products = await Product.all()
-        productList = await get_product_reviews(products)
-        random.shuffle(productList)
-        return productList[:4]
+        products = await sample_products(4)
+        return ModelResponse(await get_product_reviews(products))
 
     except Exception as e:
         logger.error(str(e))
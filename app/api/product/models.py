@@ -1,7 +1,7 @@
 from datetime import datetime
 
 from api.review.models import ReviewModel
-from pydantic import BaseModel
+from pydantic import BaseModel, Field
 
 
 class ProductModel(BaseModel):
@@ -17,3 +17,39 @@ class ProductModel(BaseModel):
     rating: float
     created_at: datetime
     updated_at: datetime
+
+
+class ProductSummaryModel(BaseModel):
+    id: int
+    category_name: str
+    image: str
+    name: str
+    description: str
+    brand: str
+    price: float
+    quantity: int
+    rating: float
+    rating_count: int
+    created_at: datetime
+    updated_at: datetime
+
+
+class ProductPageModel(BaseModel):
+    products: list[ProductModel] | list[ProductSummaryModel]
+    next_cursor: int | None
+
+
+class CartLineModel(BaseModel):
+    product_id: int
+    quantity: int = Field(gt=0)
+
+
+class UnavailableCartLineModel(BaseModel):
+    product_id: int
+    quantity: int
+
+
+class CartAvailabilityModel(BaseModel):
+    can_checkout: bool
+    prices: dict[int, float]
+    unavailable: list[UnavailableCartLineModel]
@@ -0,0 +1,32 @@
+from decimal import Decimal
+
+import orjson
+from fastapi.responses import ORJSONResponse
+from pydantic import BaseModel
+
+
+def _default(obj):
+    if isinstance(obj, BaseModel):
+        return obj.model_dump()
+    if isinstance(obj, Decimal):
+        return float(obj)
+    raise TypeError(f"Type is not JSON serializable: {type(obj).__name__}")
+
+
+def dump(content) -> bytes:
+    return orjson.dumps(content, default=_default, option=orjson.OPT_NON_STR_KEYS)
+
+
+class ModelResponse(ORJSONResponse):
+    """JSON response for content that is already validated.
+
+    Returning it from a handler skips FastAPI's second validation against
+    ``response_model`` and its ``jsonable_encoder`` pass; pydantic models are
+    dumped straight into orjson. Bytes from ``dump`` are sent as they are, so
+    cached responses are only rendered once.
+    """
+
+    def render(self, content) -> bytes:
+        if isinstance(content, bytes):
+            return content
+        return dump(content)
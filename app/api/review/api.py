@@ -1,36 +1,70 @@
-from db.schema import Review
-from fastapi import APIRouter, HTTPException
+from api.pagination import after_cursor, encode_cursor
+from api.responses import ModelResponse
+from cache import catalog_cache
+from db.schema import Product, Review
+from fastapi import APIRouter, HTTPException, Query
 from loguru import logger
+from tortoise.exceptions import IntegrityError
+from tortoise.expressions import F
+from tortoise.transactions import in_transaction
 
-from .models import ReviewCreate
+from .models import RatingBucketModel, ReviewCreate, ReviewModel, ReviewPageModel
 
 router = APIRouter()
 
 
-@router.get("/rating/{product_id}")
+@router.get("/rating/{product_id}", response_model=dict[int, RatingBucketModel])
 async def filter_reviews_by_rating(product_id: int):
     try:
-        totalReviews = await Review.filter(product_id=product_id)
-        reviewsByRating = {}
-
-        for review in totalReviews:
-            rating_value = int(review.rating)
-            if rating_value not in reviewsByRating:
-                reviewsByRating[rating_value] = {
-                    "reviews": [review],
-                    "percentage": round(1 / len(totalReviews) * 100, 2),
-                }
+        # The per star counters are kept up to date by add_review
+        product = await Product.get(id=product_id).only(
+            "id", "rating_1", "rating_2", "rating_3", "rating_4", "rating_5"
+        )
+        counts = product.rating_histogram()
 
-            else:
-                reviewsByRating[rating_value]["reviews"].append(review)
-                reviewsByRating[rating_value]["percentage"] = round(
-                    len(reviewsByRating[rating_value]["reviews"])
-                    / len(totalReviews)
-                    * 100,
-                    2,
+        total = sum(counts.values())
+        return ModelResponse(
+            {
+                rating: RatingBucketModel(
+                    count=count,
+                    percentage=round(count / total * 100, 2) if total else 0,
                 )
+                for rating, count in counts.items()
+            }
+        )
+    except Exception as e:
+        logger.error(str(e))
+        raise HTTPException(status_code=404, detail=str(e))
+
+
+@router.get("/{product_id}", response_model=ReviewPageModel)
+async def get_product_reviews(
+    product_id: int,
+    rating: int | None = Query(None, ge=1, le=5),
+    limit: int = Query(20, ge=1, le=100),
+    cursor: str | None = None,
+):
+    """Newest reviews first. Pass ``next_cursor`` back as ``cursor`` to get
+    the following page."""
+    try:
+        reviews = Review.filter(product_id=product_id)
+        if rating is not None:
+            reviews = reviews.filter(rating=rating)
+        if cursor is not None:
+            reviews = reviews.filter(after_cursor(cursor, "created_at"))
+        reviews = await reviews.order_by("-created_at", "-id").limit(limit + 1)
+
+        next_cursor = None
+        if len(reviews) > limit:
+            reviews = reviews[:limit]
+            next_cursor = encode_cursor(reviews[-1].created_at, reviews[-1].id)
 
-        return reviewsByRating
+        return ModelResponse(
+            ReviewPageModel(
+                reviews=[ReviewModel(**dict(review)) for review in reviews],
+                next_cursor=next_cursor,
+            )
+        )
     except Exception as e:
         logger.error(str(e))
         raise HTTPException(status_code=404, detail=str(e))
@@ -42,17 +76,30 @@ async def add_review(product_id: int, customer_id: str, review: ReviewCreate):
     if not check:
         try:
             review.rating = int(review.rating)
-            await Review.create(
-                **dict(review), customer_id=customer_id, product_id=product_id
-            )
+            rating_field = f"rating_{review.rating}"
+            async with in_transaction():
+                await Review.create(
+                    **dict(review), customer_id=customer_id, product_id=product_id
+                )
+                await Product.filter(id=product_id).update(
+                    rating_count=F("rating_count") + 1,
+                    rating_sum=F("rating_sum") + review.rating,
+                    **{rating_field: F(rating_field) + 1},
+                )
+            await catalog_cache.invalidate("product:list", f"product:id:{product_id}")
             return {"message": "Review added successfully"}
+        except IntegrityError as e:
+            # Unless a concurrent request added the review since the check,
+            # the product or customer does not exist
+            if not await did_customer_leave_review(product_id, customer_id):
+                logger.error(str(e))
+                raise HTTPException(status_code=404, detail=str(e))
         except Exception as e:
             logger.error(str(e))
             raise HTTPException(status_code=404, detail=str(e))
-    else:
-        raise HTTPException(
-            status_code=202, detail="Cannot leave multiple reviews for one item"
-        )
+    raise HTTPException(
+        status_code=202, detail="Cannot leave multiple reviews for one item"
+    )
 
 
 @router.get("/{product_id}/{customer_id}")
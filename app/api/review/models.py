@@ -18,3 +18,13 @@ class ReviewCreate(BaseModel):
     title: str
     rating: int
     comment: str
+
+
+class ReviewPageModel(BaseModel):
+    reviews: list[ReviewModel]
+    next_cursor: str | None
+
+
+class RatingBucketModel(BaseModel):
+    count: int
+    percentage: float
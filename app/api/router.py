@@ -1,6 +1,7 @@
 from api.address import api as address
 from api.category import api as category
 from api.customer import api as customer
+from api.health import api as health
 from api.orders import api as orders
 from api.product import api as products
 from api.review import api as reviews
@@ -14,3 +15,4 @@ router.include_router(products.router, tags=["product"], prefix="/product")
 router.include_router(customer.router, tags=["customer"], prefix="/customer")
 router.include_router(address.router, tags=["address"], prefix="/address")
 router.include_router(reviews.router, tags=["review"], prefix="/review")
+router.include_router(health.router, tags=["health"], prefix="/health")
@@ -0,0 +1,111 @@
+import asyncio
+from collections import OrderedDict
+from collections.abc import Awaitable, Callable
+from time import monotonic
+from typing import Any
+
+from db import notify
+from settings import settings
+
+_MISSING = object()
+
+
+class TTLCache:
+    """Bounded LRU cache whose entries also expire after ``ttl`` seconds.
+
+    Keys are ``:`` separated so a whole group of entries (``product:list``)
+    can be dropped at once. Invalidations are broadcast to every worker
+    through ``db.notify``. Concurrent misses of one key share a single load.
+    """
+
+    def __init__(self, name: str, maxsize: int, ttl: float):
+        self.name = name
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._entries: OrderedDict[str, tuple[float, Any]] = OrderedDict()
+        self._loading: dict[str, asyncio.Task] = {}
+        # Bumped by every invalidation, so a load that started before one
+        # does not store what it read
+        self._generation = 0
+        notify.subscribe(self.channel, self._on_invalidate)
+
+    @property
+    def channel(self):
+        return f"{self.name}_invalidate"
+
+    def get(self, key: str):
+        entry = self._entries.get(key)
+        if entry is None or entry[0] < monotonic():
+            if entry is not None:
+                del self._entries[key]
+            self.misses += 1
+            return _MISSING
+        self._entries.move_to_end(key)
+        self.hits += 1
+        return entry[1]
+
+    def set(self, key: str, value: Any):
+        self._entries[key] = (monotonic() + self.ttl, value)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.maxsize:
+            self._entries.popitem(last=False)
+            self.evictions += 1
+
+    async def get_or_load(self, key: str, loader: Callable[[], Awaitable[Any]]):
+        value = self.get(key)
+        if value is not _MISSING:
+            return value
+        load = self._loading.get(key)
+        if load is None:
+            load = asyncio.create_task(self._load(key, loader))
+            self._loading[key] = load
+        # A cancelled caller must not cancel the load the others wait on
+        return await asyncio.shield(load)
+
+    async def _load(self, key: str, loader: Callable[[], Awaitable[Any]]):
+        generation = self._generation
+        try:
+            value = await loader()
+            if generation == self._generation:
+                self.set(key, value)
+            return value
+        finally:
+            if self._loading.get(key) is asyncio.current_task():
+                del self._loading[key]
+
+    def invalidate_local(self, *prefixes: str):
+        self._generation += 1
+
+        def matches(key: str):
+            return any(
+                key == prefix or key.startswith(f"{prefix}:") for prefix in prefixes
+            )
+
+        for key in list(self._entries):
+            if matches(key):
+                del self._entries[key]
+        # Later misses start a new load instead of waiting for a stale one
+        for key in list(self._loading):
+            if matches(key):
+                del self._loading[key]
+
+    async def invalidate(self, *prefixes: str):
+        await notify.publish(self.channel, "\n".join(prefixes))
+
+    def _on_invalidate(self, payload: str):
+        self.invalidate_local(*payload.split("\n"))
+
+    def stats(self):
+        return {
+            "size": len(self._entries),
+            "maxsize": self.maxsize,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+        }
+
+
+catalog_cache = TTLCache("catalog", settings.CACHE_MAXSIZE, settings.CACHE_TTL)
@@ -0,0 +1,27 @@
+from settings import settings
+from tortoise import expand_db_url
+
+
+def postgres_connection():
+    connection = expand_db_url(str(settings.POSTGRES_URL), "asyncpg")
+    connection["engine"] = "db.pool"
+    connection["credentials"].update(
+        minsize=settings.POSTGRES_POOL_MINSIZE,
+        maxsize=settings.POSTGRES_POOL_MAXSIZE,
+        acquire_timeout=settings.POSTGRES_POOL_ACQUIRE_TIMEOUT,
+        statement_cache_size=settings.POSTGRES_STATEMENT_CACHE_SIZE,
+        max_inactive_connection_lifetime=settings.POSTGRES_MAX_CONNECTION_IDLE,
+        max_queries=settings.POSTGRES_MAX_CONNECTION_QUERIES,
+    )
+    return connection
+
+
+TORTOISE_ORM = {
+    "connections": {"default": postgres_connection()},
+    "apps": {
+        "models": {
+            "models": ["db.schema", "aerich.models"],
+            "default_connection": "default",
+        }
+    },
+}
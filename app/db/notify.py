@@ -0,0 +1,110 @@
+import asyncio
+import json
+from collections.abc import Callable
+from uuid import uuid4
+
+import asyncpg
+from loguru import logger
+from settings import settings
+from tortoise import connections
+
+# Identifies this process so it can skip its own notifications, which were
+# already delivered locally when they were published.
+PROCESS_ID = uuid4().hex
+
+_subscribers: dict[str, list[Callable[[str], None]]] = {}
+_listening_callbacks: list[Callable[[], None]] = []
+_connection: asyncpg.Connection | None = None
+_reconnect_task: asyncio.Task | None = None
+
+
+def subscribe(channel: str, callback: Callable[[str], None]):
+    _subscribers.setdefault(channel, []).append(callback)
+
+
+def on_listening(callback: Callable[[], None]):
+    """Call ``callback`` each time the listener starts listening, after a
+    reconnect too. Notifications sent while it was not listening are lost,
+    so state kept up to date by them should be reloaded from here."""
+    _listening_callbacks.append(callback)
+
+
+def _dispatch(channel: str, payload: str):
+    for callback in _subscribers.get(channel, []):
+        try:
+            callback(payload)
+        except Exception as e:
+            logger.error(f"Notification handler for {channel} failed: {e}")
+
+
+def _on_notification(connection, pid, channel, message):
+    message = json.loads(message)
+    if message["origin"] != PROCESS_ID:
+        _dispatch(channel, message["payload"])
+
+
+def _is_postgres():
+    return connections.get("default").capabilities.dialect == "postgres"
+
+
+async def publish(channel: str, payload: str = ""):
+    """Deliver a notification to this process and, on Postgres, to every
+    other worker listening on the same database."""
+    _dispatch(channel, payload)
+    if not _is_postgres():
+        return
+    try:
+        await connections.get("default").execute_query(
+            "SELECT pg_notify($1, $2)",
+            [channel, json.dumps({"origin": PROCESS_ID, "payload": payload})],
+        )
+    except Exception as e:
+        logger.error(f"Could not publish {channel} notification: {e}")
+
+
+async def _connect():
+    global _connection
+    _connection = await asyncpg.connect(str(settings.POSTGRES_URL))
+    _connection.add_termination_listener(_on_connection_lost)
+    for channel in _subscribers:
+        await _connection.add_listener(channel, _on_notification)
+    logger.info(f"Listening for notifications on {', '.join(_subscribers)}")
+    for callback in _listening_callbacks:
+        try:
+            callback()
+        except Exception as e:
+            logger.error(f"Notification listening callback failed: {e}")
+
+
+async def _reconnect():
+    delay = 1
+    while True:
+        await asyncio.sleep(delay)
+        try:
+            await _connect()
+            return
+        except Exception as e:
+            logger.error(f"Notification listener reconnect failed: {e}")
+            delay = min(delay * 2, 30)
+
+
+def _on_connection_lost(connection):
+    global _reconnect_task
+    if connection is not _connection:
+        return
+    logger.error("Notification listener connection lost, reconnecting")
+    _reconnect_task = asyncio.create_task(_reconnect())
+
+
+async def start_listener():
+    if _is_postgres() and _subscribers:
+        await _connect()
+
+
+async def stop_listener():
+    global _connection
+    if _reconnect_task:
+        _reconnect_task.cancel()
+    if _connection:
+        connection, _connection = _connection, None
+        await connection.close()
@@ -0,0 +1,183 @@
+import asyncio
+from contextlib import contextmanager
+from contextvars import ContextVar
+from time import monotonic, perf_counter
+
+import asyncpg
+from tortoise import connections
+from tortoise.backends.asyncpg.client import AsyncpgDBClient, TransactionWrapper
+from tortoise.backends.base.client import (
+    PoolConnectionWrapper,
+    TransactionContextPooled,
+)
+from tortoise.exceptions import DBConnectionError
+
+
+class QueryStats:
+    __slots__ = ("count", "seconds")
+
+    def __init__(self):
+        self.count = 0
+        self.seconds = 0.0
+
+    def add(self, seconds: float):
+        self.count += 1
+        self.seconds += seconds
+
+
+# Queries of the whole process, and of the current request when one is
+# being tracked with ``track_queries``
+query_totals = QueryStats()
+_current_queries: ContextVar[QueryStats | None] = ContextVar(
+    "current_queries", default=None
+)
+# Stands in for the current stats while the pool resets a connection
+_UNTRACKED = QueryStats()
+
+
+@contextmanager
+def track_queries():
+    """Count the queries made inside the block, including those of tasks it
+    starts."""
+    stats = QueryStats()
+    token = _current_queries.set(stats)
+    try:
+        yield stats
+    finally:
+        _current_queries.reset(token)
+
+
+@contextmanager
+def _timed():
+    stats = _current_queries.get()
+    if stats is _UNTRACKED:
+        yield
+        return
+    start = perf_counter()
+    try:
+        yield
+    finally:
+        seconds = perf_counter() - start
+        query_totals.add(seconds)
+        if stats is not None:
+            stats.add(seconds)
+
+
+class InstrumentedConnection(asyncpg.Connection):
+    """Times every statement Tortoise sends, transaction control included."""
+
+    __slots__ = ()
+
+    async def execute(self, query, *args, **kwargs):
+        with _timed():
+            return await super().execute(query, *args, **kwargs)
+
+    async def executemany(self, command, args, **kwargs):
+        with _timed():
+            return await super().executemany(command, args, **kwargs)
+
+    async def fetch(self, query, *args, **kwargs):
+        with _timed():
+            return await super().fetch(query, *args, **kwargs)
+
+    async def fetchrow(self, query, *args, **kwargs):
+        with _timed():
+            return await super().fetchrow(query, *args, **kwargs)
+
+    async def reset(self, **kwargs):
+        # Run by the pool when a connection is released, not by the app
+        token = _current_queries.set(_UNTRACKED)
+        try:
+            return await super().reset(**kwargs)
+        finally:
+            _current_queries.reset(token)
+
+
+class InstrumentedPoolConnectionWrapper(PoolConnectionWrapper):
+    async def __aenter__(self):
+        await self.ensure_connection()
+        self.connection = await self.client.acquire_from_pool()
+        return self.connection
+
+
+class InstrumentedTransactionContext(TransactionContextPooled):
+    async def __aenter__(self):
+        await self.ensure_connection()
+        parent = self.connection._parent
+        self.connection._connection = await parent.acquire_from_pool()
+        self.token = connections.set(self.connection_name, self.connection)
+        await self.connection.start()
+        return self.connection
+
+
+class InstrumentedAsyncpgClient(AsyncpgDBClient):
+    """Tortoise's asyncpg client with a bounded wait for pool connections and
+    counters describing how the pool is used.
+
+    Selected with ``"engine": "db.pool"``. Besides the usual asyncpg pool
+    arguments it takes ``acquire_timeout``, the number of seconds a query waits
+    for a free connection before failing instead of queueing forever.
+    """
+
+    connection_class = InstrumentedConnection
+
+    def __init__(self, acquire_timeout: float | None = None, **kwargs):
+        super().__init__(**kwargs)
+        self.acquire_timeout = float(acquire_timeout) if acquire_timeout else None
+        self.waiting = 0
+        self.acquired = 0
+        self.timeouts = 0
+        self.wait_seconds = 0.0
+        self.max_wait_seconds = 0.0
+
+    async def acquire_from_pool(self):
+        self.waiting += 1
+        start = monotonic()
+        try:
+            connection = await self._pool.acquire(timeout=self.acquire_timeout)
+        except asyncio.TimeoutError:
+            self.timeouts += 1
+            raise DBConnectionError(
+                f"No database connection available after {self.acquire_timeout}s"
+            )
+        finally:
+            waited = monotonic() - start
+            self.waiting -= 1
+            self.wait_seconds += waited
+            self.max_wait_seconds = max(self.max_wait_seconds, waited)
+        self.acquired += 1
+        return connection
+
+    def acquire_connection(self):
+        return InstrumentedPoolConnectionWrapper(self)
+
+    def _in_transaction(self):
+        return InstrumentedTransactionContext(TransactionWrapper(self))
+
+    def stats(self):
+        size = self._pool.get_size() if self._pool else 0
+        idle = self._pool.get_idle_size() if self._pool else 0
+        return {
+            "minsize": self.pool_minsize,
+            "maxsize": self.pool_maxsize,
+            "size": size,
+            "idle": idle,
+            "in_use": size - idle,
+            "waiting": self.waiting,
+            "acquired": self.acquired,
+            "timeouts": self.timeouts,
+            "wait_seconds": self.wait_seconds,
+            "max_wait_seconds": self.max_wait_seconds,
+        }
+
+
+def pool_stats():
+    """Statistics of every instrumented connection pool, by connection name."""
+    return {
+        client.connection_name: client.stats()
+        for client in connections.all()
+        if isinstance(client, InstrumentedAsyncpgClient)
+    }
+
+
+client_class = InstrumentedAsyncpgClient
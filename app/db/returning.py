@@ -0,0 +1,46 @@
+from functools import reduce
+from operator import or_
+
+from tortoise import timezone
+from tortoise.expressions import Q
+from tortoise.queryset import QuerySet
+
+
+def changes(**values):
+    """Filter for rows where any of ``values`` differs from the stored one,
+    with NULL compared like any other value."""
+    return reduce(
+        or_,
+        (
+            (
+                Q(**{f"{field}__isnull": False})
+                if value is None
+                else Q(**{f"{field}__not": value}) | Q(**{f"{field}__isnull": True})
+            )
+            for field, value in values.items()
+        ),
+    )
+
+
+async def update_returning(queryset: QuerySet, **values):
+    """``queryset.update(**values)`` as a single ``UPDATE ... RETURNING``.
+
+    Returns the updated rows as model instances, so a handler needs no
+    second query to read back what it wrote. ``auto_now`` fields are set
+    like ``save()`` would.
+    """
+    model = queryset.model
+    for field in model._meta.fields_map.values():
+        if getattr(field, "auto_now", False):
+            values.setdefault(field.model_field_name, timezone.now())
+
+    # Tortoise has no public way to add RETURNING, so this reaches into the
+    # UpdateQuery of tortoise-orm 0.20, which pyproject.toml pins
+    query = queryset.update(**values)
+    if query._db is None:
+        query._db = query._choose_db(True)
+    query._make_query()
+    rows = await query._db.execute_query_dict(
+        f"{query.query} RETURNING *", query.values
+    )
+    return [model._init_from_db(**row) for row in rows]
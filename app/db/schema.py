@@ -1,9 +1,15 @@
+import re
 from enum import IntEnum
 
 from tortoise import fields
 from tortoise.models import Model
 
 
+def slugify(name: str):
+    """URL form of a category name, "Energy Drinks" -> "energy-drinks"."""
+    return "-".join(re.findall(r"[^\W_]+", name.lower()))
+
+
 class Customer(Model):
     id = fields.CharField(pk=True, max_length=255, unique=True)
     first_name = fields.CharField(max_length=255)
@@ -20,7 +26,9 @@ class Customer(Model):
 
 class Category(Model):
     id = fields.IntField(pk=True)
-    name = fields.CharField(max_length=255)
+    name = fields.CharField(max_length=255, unique=True)
+    # Set from the name with ``slugify``, categories are looked up by it
+    slug = fields.CharField(max_length=255, unique=True)
     description = fields.TextField()
     products: fields.ReverseRelation["Product"]
     created_at = fields.DatetimeField(auto_now_add=True)
@@ -35,15 +43,29 @@ class Product(Model):
     id = fields.IntField(pk=True)
     category = fields.ForeignKeyField("models.Category", related_name="products")
     image = fields.CharField(max_length=255)
-    name = fields.CharField(max_length=255)
+    name = fields.CharField(max_length=255, unique=True)
     description = fields.TextField()
-    brand = fields.CharField(max_length=255)
+    brand = fields.CharField(max_length=255, index=True)
     price = fields.DecimalField(max_digits=10, decimal_places=2)
     quantity = fields.IntField()
     reviews: fields.ReverseRelation["Review"]
+    # Rating summary kept in sync by add_review so listings never scan reviews
+    rating_count = fields.IntField(default=0)
+    rating_sum = fields.IntField(default=0)
+    rating_1 = fields.IntField(default=0)
+    rating_2 = fields.IntField(default=0)
+    rating_3 = fields.IntField(default=0)
+    rating_4 = fields.IntField(default=0)
+    rating_5 = fields.IntField(default=0)
     created_at = fields.DatetimeField(auto_now_add=True)
     updated_at = fields.DatetimeField(auto_now=True)
 
+    def average_rating(self):
+        return self.rating_sum / self.rating_count if self.rating_count else 0
+
+    def rating_histogram(self):
+        return {rating: getattr(self, f"rating_{rating}") for rating in range(1, 6)}
+
     class Meta:
         table = "products"
         table_description = "The 'products' table stores information about products."
@@ -73,6 +95,9 @@ class Address(Model):
 
     class Meta:
         table = "addresses"
+        # The migrations also add a partial unique index on customer_id where
+        # is_default, so a customer has at most one main address
+        indexes = (("customer_id", "is_default"),)
         table_description = (
             "The 'addresses' table stores addresses associated with customers."
         )
@@ -101,6 +126,13 @@ class Review(Model):
         table_description = (
             "The 'reviews' table stores reviews associated with products."
         )
+        # One review per customer and product
+        unique_together = (("product_id", "customer_id"),)
+        # Serve the review pages newest first, with and without a rating
+        indexes = (
+            ("product_id", "created_at", "id"),
+            ("product_id", "rating", "created_at"),
+        )
 
 
 class StatusType(IntEnum):
@@ -118,10 +150,15 @@ class Order(Model):
     status: StatusType = fields.IntEnumField(StatusType)
     orderDate = fields.DatetimeField(auto_now_add=True)
 
+    class Meta:
+        indexes = (("customer_id", "orderDate"),)
+
 
 class OrderItem(Model):
     id = fields.IntField(pk=True)
-    order = fields.ForeignKeyField("models.Order", related_name="orderItems")
+    order = fields.ForeignKeyField(
+        "models.Order", related_name="orderItems", index=True
+    )
     product = fields.ForeignKeyField("models.Product", related_name="orderItems")
     quantity = fields.IntField()
     price = fields.DecimalField(max_digits=10, decimal_places=2)
@@ -129,3 +166,36 @@ class OrderItem(Model):
     class Meta:
         table = "orderItems"
         table_description = "The 'orderItems' table stores information about each order and which items are within each separate order for each customer. "
+
+
+class WebhookEventStatus(IntEnum):
+    PENDING = 0
+    PROCESSED = 1
+    FAILED = 2
+
+
+class WebhookEvent(Model):
+    id = fields.CharField(pk=True, max_length=255)
+    type = fields.CharField(max_length=255)
+    payload = fields.JSONField()
+    status = fields.IntEnumField(WebhookEventStatus, default=WebhookEventStatus.PENDING)
+    attempts = fields.IntField(default=0)
+    next_attempt_at = fields.DatetimeField()
+    last_error = fields.TextField(null=True)
+    created_at = fields.DatetimeField(auto_now_add=True)
+    processed_at = fields.DatetimeField(null=True)
+
+    class Meta:
+        table = "webhook_events"
+        table_description = "The 'webhook_events' table is the inbox of Stripe events, keyed by Stripe event id, waiting to be processed by the order worker."
+        indexes = (("status", "next_attempt_at"),)
+
+
+class SeedState(Model):
+    name = fields.CharField(pk=True, max_length=255)
+    content_hash = fields.CharField(max_length=64)
+    updated_at = fields.DatetimeField(auto_now=True)
+
+    class Meta:
+        table = "seed_state"
+        table_description = "The 'seed_state' table records the hash of the seed data last loaded, so unchanged data is not loaded again."
@@ -0,0 +1,34 @@
+import re
+
+from tortoise import connections
+
+# "search_vector" is a generated column over name, brand and description,
+# added with its GIN index by the migrations. It uses the 'simple'
+# configuration so prefix matching works on brand names and partial words
+# ("coc" -> "Coca-Cola"), which stemming would not.
+SEARCH_SQL = """
+SELECT "id" FROM "products", to_tsquery('simple', $1) AS "query"
+WHERE "search_vector" @@ "query"
+ORDER BY ts_rank("search_vector", "query") DESC, "id"
+LIMIT $2 OFFSET $3
+"""
+
+
+def is_supported():
+    return connections.get("default").capabilities.dialect == "postgres"
+
+
+def to_tsquery(query: str):
+    terms = re.findall(r"\w+", query.lower())
+    return " & ".join(f"{term}:*" for term in terms)
+
+
+async def search_product_ids(query: str, limit: int | None, offset: int):
+    """Ids of the products matching ``query``, most relevant first."""
+    tsquery = to_tsquery(query)
+    if not tsquery:
+        return []
+    rows = await connections.get("default").execute_query_dict(
+        SEARCH_SQL, [tsquery, limit, offset]
+    )
+    return [row["id"] for row in rows]
@@ -0,0 +1,66 @@
+import logging
+import sys
+from random import random
+
+from loguru import logger
+from settings import settings
+
+
+class InterceptHandler(logging.Handler):
+    """Sends records of the standard ``logging`` loggers (uvicorn, gunicorn,
+    tortoise) to loguru, keeping the origin recorded on the ``LogRecord``
+    instead of walking the stack to find it."""
+
+    def emit(self, record: logging.LogRecord):
+        try:
+            level = logger.level(record.levelname).name
+        except ValueError:
+            level = record.levelno
+
+        def origin(message_record):
+            message_record.update(
+                name=record.name,
+                module=record.module,
+                function=record.funcName,
+                line=record.lineno,
+            )
+            message_record["file"].name = record.filename
+            message_record["file"].path = record.pathname
+
+        logger.patch(origin).opt(exception=record.exc_info).log(
+            level, record.getMessage()
+        )
+
+
+def setup_logging():
+    """Route all logging through one loguru sink.
+
+    The sink is queue backed, so formatting and writing happen on a
+    background thread instead of in the request handling the event loop.
+    Records below ``LOG_LEVEL`` are dropped before they are built.
+    """
+    logging.root.handlers = [InterceptHandler()]
+    logging.root.setLevel(settings.LOG_LEVEL)
+    for name in logging.root.manager.loggerDict.keys():
+        logging.getLogger(name).handlers = []
+        logging.getLogger(name).propagate = True
+
+    logger.configure(
+        handlers=[
+            {
+                "sink": sys.stdout,
+                "level": settings.LOG_LEVEL,
+                "serialize": settings.JSON_LOGS,
+                "enqueue": True,
+            }
+        ]
+    )
+
+
+def sample(route: str):
+    """Whether to emit a high volume debug line for ``route``.
+
+    Lines logged on every request are guarded with this so only a share of
+    them, ``LOG_SAMPLE_RATES[route]`` or ``LOG_SAMPLE_RATE``, reach the sink.
+    """
+    return random() < settings.LOG_SAMPLE_RATES.get(route, settings.LOG_SAMPLE_RATE)
@@ -1,20 +1,18 @@
-import json
-from random import randint, random
-
+from api.category.directory import load_directory, start_refresh, stop_refresh
+from api.orders.inbox import inbox_worker
 from api.router import router
-from db.schema import Category, Product
+from db import notify
+from db.config import TORTOISE_ORM
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
-from loguru import logger
-from settings import settings
-from tortoise import expand_db_url
+from fastapi.responses import ORJSONResponse, PlainTextResponse
+from log import setup_logging
+from metrics import MetricsMiddleware, render
 from tortoise.contrib.fastapi import register_tortoise
-from tortoise.exceptions import DoesNotExist
-
-data = {}
 
+setup_logging()
 
-app = FastAPI(docs_url=None, redoc_url=None)
+app = FastAPI(docs_url=None, redoc_url=None, default_response_class=ORJSONResponse)
 
 app.add_middleware(
     CORSMiddleware,
@@ -23,21 +21,26 @@ app.add_middleware(
     allow_methods=["*"],
     allow_headers=["*"],
 )
+app.add_middleware(MetricsMiddleware)
+
+
+# Shutdown handlers run in registration order, so the inbox worker and the
+# category directory refresh are registered before Tortoise closes the
+# connections they still need.
+@app.on_event("shutdown")
+async def stop_inbox_worker():
+    await inbox_worker.stop()
+
+
+@app.on_event("shutdown")
+async def stop_category_directory_refresh():
+    stop_refresh()
+
 
 register_tortoise(
     app,
-    config={
-        "connections": {
-            "default": expand_db_url(str(settings.POSTGRES_URL), "asyncpg")
-        },
-        "apps": {
-            "models": {
-                "models": ["db.schema", "aerich.models"],
-                "default_connection": "default",
-            }
-        },
-    },
-    generate_schemas=True,
+    config=TORTOISE_ORM,
+    generate_schemas=False,
     add_exception_handlers=True,
 )
 
@@ -45,42 +48,27 @@ register_tortoise(
 app.include_router(router)
 
 
+@app.get("/metrics", include_in_schema=False)
+async def get_metrics():
+    return PlainTextResponse(render(), media_type="text/plain; version=0.0.4")
+
+
 @app.on_event("startup")
-async def load_products():
-    with open("app/db/data.json", "r") as file:
-        data.update(json.load(file))
-
-    for category in data["categories"]:
-        try:
-            category_exists = await Category.get(name=category["name"])
-            logger.info(f"Category {category_exists.name} already exists")
-
-        except DoesNotExist:
-            await Category.create(**dict(category))
-            logger.info(f"Created category {category['name']}")
-
-    for product in data["products"]:
-        try:
-            product_exists = await Product.get(name=product["name"])
-            logger.info(f"Product {product_exists.name} already exists")
-
-        except DoesNotExist:
-            try:
-                category = await Category.get(name=product["category_name"])
-                logger.info(f"Category {category.name} found")
-
-                logger.info(f"Creating product {product['name']}")
-                await Product.create(
-                    image=product["image"],
-                    name=product["name"],
-                    description=product["description"],
-                    brand=product["brand"],
-                    category_id=category.id,
-                    price=round(random() + 1, 2),
-                    quantity=randint(70, 150),
-                )
-                logger.info(f"Created product {product['name']}")
-            except DoesNotExist:
-                logger.info(f"Category {product['category']} not found")
-                logger.info(f"Product {product['name']} not created")
-                continue
+async def load_category_directory():
+    await load_directory()
+    start_refresh()
+
+
+@app.on_event("startup")
+async def start_notification_listener():
+    await notify.start_listener()
+
+
+@app.on_event("startup")
+async def start_inbox_worker():
+    inbox_worker.start()
+
+
+@app.on_event("shutdown")
+async def stop_notification_listener():
+    await notify.stop_listener()
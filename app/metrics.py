@@ -0,0 +1,207 @@
+from bisect import bisect_left
+from time import perf_counter
+
+from cache import catalog_cache
+from db.pool import pool_stats, query_totals, track_queries
+from loguru import logger
+from settings import settings
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+QUERY_BUCKETS = (0, 1, 2, 3, 5, 10, 20, 50, 100)
+
+
+class Histogram:
+    def __init__(self, name: str, description: str, buckets: tuple):
+        self.name = name
+        self.description = description
+        self.buckets = buckets
+        # labels -> [count per bucket..., count above the last bucket, sum]
+        self.series: dict[tuple, list] = {}
+
+    def observe(self, labels: tuple, value: float):
+        series = self.series.get(labels)
+        if series is None:
+            series = self.series[labels] = [0] * (len(self.buckets) + 1) + [0.0]
+        series[bisect_left(self.buckets, value)] += 1
+        series[-1] += value
+
+    def render(self, label_names: tuple):
+        lines = [
+            f"# HELP {self.name} {self.description}",
+            f"# TYPE {self.name} histogram",
+        ]
+        for labels, series in self.series.items():
+            label_text = _labels(label_names, labels)
+            cumulative = 0
+            for bucket, count in zip(self.buckets, series):
+                cumulative += count
+                lines.append(
+                    f'{self.name}_bucket{{{label_text},le="{bucket}"}} {cumulative}'
+                )
+            cumulative += series[-2]
+            lines.append(f'{self.name}_bucket{{{label_text},le="+Inf"}} {cumulative}')
+            lines.append(f"{self.name}_sum{{{label_text}}} {series[-1]}")
+            lines.append(f"{self.name}_count{{{label_text}}} {cumulative}")
+        return lines
+
+
+def _labels(names: tuple, values: tuple):
+    return ",".join(f'{name}="{value}"' for name, value in zip(names, values))
+
+
+def _metric(name: str, kind: str, description: str, samples: list[tuple]):
+    lines = [f"# HELP {name} {description}", f"# TYPE {name} {kind}"]
+    for label_text, value in samples:
+        lines.append(
+            f"{name}{{{label_text}}} {value}" if label_text else f"{name} {value}"
+        )
+    return lines
+
+
+ROUTE_LABELS = ("method", "route")
+
+request_latency = Histogram(
+    "http_request_duration_seconds", "Request latency by route.", LATENCY_BUCKETS
+)
+request_queries = Histogram(
+    "http_request_db_queries", "Database queries made per request.", QUERY_BUCKETS
+)
+request_db_time = Histogram(
+    "http_request_db_seconds",
+    "Time per request spent waiting on database queries.",
+    LATENCY_BUCKETS,
+)
+# (method, route, status) -> requests
+responses: dict[tuple, int] = {}
+# (method, route) -> requests that made more queries than their budget
+over_budget: dict[tuple, int] = {}
+
+
+def query_budget(route: str):
+    return settings.QUERY_BUDGETS.get(route, settings.QUERY_BUDGET)
+
+
+class MetricsMiddleware:
+    """Records latency, query count and database time of every request.
+
+    Requests are grouped by their route template (``/product/{product_id}``),
+    never by the raw path, so the number of series stays bounded.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+
+        status = 500
+
+        async def send_with_status(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            await send(message)
+
+        start = perf_counter()
+        with track_queries() as queries:
+            try:
+                await self.app(scope, receive, send_with_status)
+            finally:
+                elapsed = perf_counter() - start
+                route = getattr(scope.get("route"), "path", "unmatched")
+                self.record(scope["method"], route, status, elapsed, queries)
+
+    def record(self, method: str, route: str, status: int, elapsed, queries):
+        labels = (method, route)
+        request_latency.observe(labels, elapsed)
+        request_queries.observe(labels, queries.count)
+        request_db_time.observe(labels, queries.seconds)
+        key = (method, route, status)
+        responses[key] = responses.get(key, 0) + 1
+
+        budget = query_budget(route)
+        if queries.count > budget:
+            over_budget[labels] = over_budget.get(labels, 0) + 1
+            logger.warning(
+                "{} {} made {} queries, over its budget of {}",
+                method,
+                route,
+                queries.count,
+                budget,
+            )
+
+
+def render():
+    """All metrics of this process in the Prometheus text format."""
+    lines = []
+    lines += request_latency.render(ROUTE_LABELS)
+    lines += request_queries.render(ROUTE_LABELS)
+    lines += request_db_time.render(ROUTE_LABELS)
+    lines += _metric(
+        "http_requests_total",
+        "counter",
+        "Requests by route and status.",
+        [
+            (_labels((*ROUTE_LABELS, "status"), key), count)
+            for key, count in responses.items()
+        ],
+    )
+    lines += _metric(
+        "http_requests_over_query_budget_total",
+        "counter",
+        "Requests that made more database queries than their route's budget.",
+        [(_labels(ROUTE_LABELS, key), count) for key, count in over_budget.items()],
+    )
+    lines += _metric(
+        "db_queries_total",
+        "counter",
+        "Database queries made by this process.",
+        [("", query_totals.count)],
+    )
+    lines += _metric(
+        "db_query_seconds_total",
+        "counter",
+        "Time this process spent waiting on database queries.",
+        [("", query_totals.seconds)],
+    )
+
+    caches = {catalog_cache.name: catalog_cache.stats()}
+    for stat, kind in (
+        ("hits", "counter"),
+        ("misses", "counter"),
+        ("evictions", "counter"),
+        ("size", "gauge"),
+        ("maxsize", "gauge"),
+    ):
+        name = f"cache_{stat}_total" if kind == "counter" else f"cache_{stat}"
+        lines += _metric(
+            name,
+            kind,
+            f"Cache {stat}.",
+            [(f'cache="{cache}"', stats[stat]) for cache, stats in caches.items()],
+        )
+
+    pools = pool_stats()
+    for stat, kind in (
+        ("size", "gauge"),
+        ("maxsize", "gauge"),
+        ("idle", "gauge"),
+        ("in_use", "gauge"),
+        ("waiting", "gauge"),
+        ("acquired", "counter"),
+        ("timeouts", "counter"),
+        ("wait_seconds", "counter"),
+        ("max_wait_seconds", "gauge"),
+    ):
+        name = f"db_pool_{stat}_total" if kind == "counter" else f"db_pool_{stat}"
+        lines += _metric(
+            name,
+            kind,
+            f"Connection pool {stat.replace('_', ' ')}.",
+            [
+                (f'connection="{connection}"', stats[stat])
+                for connection, stats in pools.items()
+            ],
+        )
+    return "\n".join(lines) + "\n"
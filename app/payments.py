@@ -0,0 +1,60 @@
+import asyncio
+import json
+from functools import cache
+from uuid import uuid4
+
+import stripe
+from settings import settings
+
+
+class StripeClient:
+    """Runs the blocking Stripe SDK in a worker thread so a slow Stripe round
+    trip never stalls the event loop."""
+
+    def __init__(self, api_key: str, webhook_secret: str, timeout: float):
+        self.api_key = api_key
+        self.webhook_secret = webhook_secret
+        self.timeout = timeout
+        stripe.default_http_client = stripe.new_default_http_client(timeout=timeout)
+
+    async def create_checkout_session(self, **params):
+        return await asyncio.wait_for(
+            asyncio.to_thread(
+                stripe.checkout.Session.create, api_key=self.api_key, **params
+            ),
+            timeout=self.timeout,
+        )
+
+    def construct_event(self, payload: str, sig_header: str | None):
+        return stripe.Webhook.construct_event(payload, sig_header, self.webhook_secret)
+
+
+class FakePaymentClient:
+    """Local stand-in for load tests. Sessions never reach Stripe and webhook
+    payloads are accepted without checking their signature."""
+
+    async def create_checkout_session(self, **params):
+        session_id = f"cs_test_{uuid4().hex}"
+        return stripe.checkout.Session.construct_from(
+            {
+                "id": session_id,
+                "object": "checkout.session",
+                "url": f"{params['success_url']}?session_id={session_id}",
+                **params,
+            },
+            None,
+        )
+
+    def construct_event(self, payload: str, sig_header: str | None):
+        return stripe.Event.construct_from(json.loads(payload), None)
+
+
+@cache
+def get_payment_client():
+    if settings.PAYMENT_CLIENT == "fake":
+        return FakePaymentClient()
+    return StripeClient(
+        settings.STRIPE_SECRET_KEY,
+        settings.STRIPE_WEBHOOK_SECRET,
+        settings.STRIPE_TIMEOUT,
+    )
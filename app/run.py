@@ -1,54 +1,51 @@
-import logging
-
-from loguru import logger
+import uvicorn
+from gunicorn.app.base import BaseApplication
 from settings import settings
-from uvicorn import Config, Server
-
-""" LOG_LEVEL = (
-    logging.getLevelName("INFO")
-    if not settings.DEBUG
-    else logging.getLevelName("DEBUG")
-)
-JSON_LOGS = bool(os.environ.get("JSON_LOGS")) if not settings.JSON_LOGS else True """
-
-
-class InterceptHandler(logging.Handler):
-    def emit(self, record):
-        try:
-            level = logger.level(record.levelname).name
-        except ValueError:
-            level = record.levelno
-        frame, depth = logging.currentframe(), 2
-        while frame.f_code.co_filename == logging.__file__:
-            frame = frame.f_back
-            depth += 1
-
-        logger.opt(depth=depth, exception=record.exc_info).log(
-            level, record.getMessage()
-        )
+from uvicorn.workers import UvicornWorker
+
+
+class Worker(UvicornWorker):
+    CONFIG_KWARGS = {"loop": "uvloop", "http": "httptools"}
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        # Stop waiting for in-flight requests shortly before gunicorn kills
+        # the worker, so the app's shutdown handlers still get to run.
+        self.config.timeout_graceful_shutdown = max(self.cfg.graceful_timeout - 5, 1)
 
 
-def _setup_logging():
-    logging.root.handlers = [InterceptHandler()]
-    """ logging.root.setLevel(LOG_LEVEL) """
-    for name in logging.root.manager.loggerDict.keys():
-        logging.getLogger(name).handlers = []
-        logging.getLogger(name).propagate = True
+class Application(BaseApplication):
+    """Serves the app from several uvicorn worker processes managed by
+    gunicorn, which replaces workers that exit or reach ``MAX_REQUESTS``."""
 
+    def load_config(self):
+        options = {
+            "bind": f"{settings.HOST}:{settings.PORT}",
+            "workers": settings.WORKERS,
+            "worker_class": "run.Worker",
+            "keepalive": settings.KEEPALIVE,
+            "backlog": settings.BACKLOG,
+            "max_requests": settings.MAX_REQUESTS,
+            "max_requests_jitter": settings.MAX_REQUESTS_JITTER,
+            "graceful_timeout": settings.GRACEFUL_TIMEOUT,
+        }
+        for key, value in options.items():
+            self.cfg.set(key, value)
+
+    def load(self):
+        from main import app
+
+        return app
 
-"""     logger.configure(handlers=[{"sink": sys.stdout, "serialize": JSON_LOGS}])
- """
 
 if __name__ == "__main__":
-    server = Server(
-        Config(
+    if settings.RELOAD:
+        uvicorn.run(
             "main:app",
             host=str(settings.HOST),
-            # log_level=LOG_LEVEL,
+            log_level=settings.LOG_LEVEL.lower(),
             port=settings.PORT,
-            reload=settings.RELOAD,
-        ),
-    )
-    _setup_logging()
-
-    server.run()
+            reload=True,
+        )
+    else:
+        Application().run()
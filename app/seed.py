@@ -0,0 +1,96 @@
+import argparse
+import hashlib
+import json
+from random import randint, random
+
+from api.category.directory import publish_categories_changed
+from cache import catalog_cache
+from db.config import TORTOISE_ORM
+from db.schema import Category, Product, SeedState, slugify
+from loguru import logger
+from tortoise import Tortoise, run_async
+from tortoise.transactions import in_transaction
+
+DATA_FILE = "app/db/data.json"
+SEED_NAME = "catalog"
+
+
+async def seed_catalog(raw: bytes, force: bool = False):
+    """Upsert the categories and products of ``raw`` in one transaction.
+
+    Nothing is written when the data is unchanged since the last run. Price
+    and stock of existing products are left alone; new products get a random
+    price and quantity.
+    """
+    content_hash = hashlib.sha256(raw).hexdigest()
+    state = await SeedState.get_or_none(name=SEED_NAME)
+    if state and state.content_hash == content_hash and not force:
+        logger.info("Catalog data unchanged, skipping seed")
+        return
+
+    data = json.loads(raw)
+    async with in_transaction():
+        await Category.bulk_create(
+            [
+                Category(**category, slug=slugify(category["name"]))
+                for category in data["categories"]
+            ],
+            on_conflict=["name"],
+            update_fields=["slug", "description", "updated_at"],
+        )
+        category_ids = dict(await Category.all().values_list("name", "id"))
+
+        products = []
+        for product in data["products"]:
+            if product["category_name"] not in category_ids:
+                logger.warning(
+                    f"Category {product['category_name']} not found, "
+                    f"product {product['name']} not created"
+                )
+                continue
+            products.append(
+                Product(
+                    image=product["image"],
+                    name=product["name"],
+                    description=product["description"],
+                    brand=product["brand"],
+                    category_id=category_ids[product["category_name"]],
+                    price=round(random() + 1, 2),
+                    quantity=randint(70, 150),
+                )
+            )
+        await Product.bulk_create(
+            products,
+            on_conflict=["name"],
+            update_fields=[
+                "image",
+                "description",
+                "brand",
+                "category_id",
+                "updated_at",
+            ],
+        )
+
+        await SeedState.update_or_create(
+            name=SEED_NAME, defaults={"content_hash": content_hash}
+        )
+
+    await catalog_cache.invalidate("category", "product")
+    await publish_categories_changed()
+    logger.info(
+        f"Seeded {len(data['categories'])} categories and {len(products)} products"
+    )
+
+
+async def main(force: bool):
+    await Tortoise.init(config=TORTOISE_ORM)
+    with open(DATA_FILE, "rb") as file:
+        await seed_catalog(file.read(), force)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Load the catalog in data.json")
+    parser.add_argument(
+        "--force", action="store_true", help="seed even if data.json is unchanged"
+    )
+    run_async(main(parser.parse_args().force))
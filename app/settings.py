@@ -1,3 +1,4 @@
+import os
 from functools import cache
 from os import getenv
 
@@ -7,6 +8,16 @@ from pydantic_settings import BaseSettings
 is_dbg = getenv("APP_DEBUG", False) == "True"
 
 
+def default_workers():
+    """CPUs this process may run on, at most 4. ``os.cpu_count()`` counts
+    every CPU of the host, also in a container limited to a few of them."""
+    if hasattr(os, "sched_getaffinity"):
+        cpus = len(os.sched_getaffinity(0))
+    else:
+        cpus = os.cpu_count() or 1
+    return min(cpus, 4)
+
+
 class Settings(BaseSettings):
     DEBUG: bool = is_dbg
 
@@ -16,6 +27,20 @@ class Settings(BaseSettings):
     POSTGRES_PORT: int
     POSTGRES_DB: str
     POSTGRES_URL: PostgresDsn
+    # Each app worker opens its own pool plus one connection listening for
+    # notifications, so WORKERS * (POSTGRES_POOL_MAXSIZE + 1) must stay below
+    # the server's max_connections, 100 by default less a few reserved for
+    # superusers. The defaults take 4 * (10 + 1) = 44.
+    POSTGRES_POOL_MINSIZE: int = 1
+    POSTGRES_POOL_MAXSIZE: int = 10
+    # Seconds a query waits for a free connection before failing
+    POSTGRES_POOL_ACQUIRE_TIMEOUT: float = 10
+    # Prepared statements cached per connection, 0 behind pgbouncer
+    POSTGRES_STATEMENT_CACHE_SIZE: int = 100
+    # Idle connections are closed after this many seconds and connections
+    # are replaced after serving this many queries
+    POSTGRES_MAX_CONNECTION_IDLE: float = 300
+    POSTGRES_MAX_CONNECTION_QUERIES: int = 50000
 
     # pydantic will fail from the extra env vars
     APP_DEBUG: bool = is_dbg
@@ -29,8 +54,41 @@ class Settings(BaseSettings):
     HOST: IPvAnyAddress
     PORT: int
     JSON_LOGS: bool = False
+    LOG_LEVEL: str = "DEBUG" if is_dbg else "INFO"
+    # Share of the high volume debug lines that is logged, overridable per
+    # route, e.g. LOG_SAMPLE_RATES='{"product:list": 1}'
+    LOG_SAMPLE_RATE: float = 0.01
+    LOG_SAMPLE_RATES: dict[str, float] = {}
+    # Requests making more queries than their route's budget log a warning,
+    # e.g. QUERY_BUDGETS='{"/product/all": 3}'
+    QUERY_BUDGET: int = 10
+    QUERY_BUDGETS: dict[str, int] = {}
+
+    STRIPE_SECRET_KEY: str = ""
+    STRIPE_WEBHOOK_SECRET: str = ""
+    STRIPE_URL: str = ""
+    STRIPE_TIMEOUT: float = 10
+    # "stripe" or "fake", the local stand-in used for load tests
+    PAYMENT_CLIENT: str = "stripe"
+
+    CACHE_TTL: float = 300
+    CACHE_MAXSIZE: int = 1024
+    # Seconds between full reloads of the in-memory category directory, on
+    # top of the reloads on change notifications. 0 disables them.
+    CATEGORY_DIRECTORY_REFRESH: float = 300
     RELOAD: bool = True if is_dbg else False
 
+    # Serving without RELOAD runs WORKERS processes under gunicorn
+    WORKERS: int = default_workers()
+    KEEPALIVE: int = 5
+    BACKLOG: int = 2048
+    # Workers are replaced after MAX_REQUESTS plus up to MAX_REQUESTS_JITTER
+    # requests, so they do not all restart at once. 0 disables it.
+    MAX_REQUESTS: int = 10000
+    MAX_REQUESTS_JITTER: int = 1000
+    # Seconds a stopping worker gets to finish its in-flight requests
+    GRACEFUL_TIMEOUT: int = 30
+
     class Config:
         env_file = "./.devenv"  # if is_dbg else "./.env"
 
@@ -0,0 +1,118 @@
+"""Check that no endpoint makes more queries than its declared budget.
+
+Drives every route of bench/load.py against an in-memory SQLite database,
+once on a small dataset and once on a five times larger one, with the
+catalog cache disabled. Fails when a route makes more queries than its
+budget in QUERY_BUDGETS, has no budget, or makes more queries on the larger
+dataset than on the small one, which is how a query issued per row shows up.
+
+    python bench/query_budget.py
+    python bench/query_budget.py --only /product /order
+"""
+
+import argparse
+import asyncio
+import os
+import sys
+
+from load import configure_environment, load_app, run_scenarios, seed_on_startup
+
+DB_URL = "sqlite://:memory:"
+SCALES = (0.001, 0.005)
+
+# Most queries a single request of each route may make, whatever the size
+# of the data. On Postgres the pg_notify of each cache or category directory
+# change counts too, which these allow for.
+QUERY_BUDGETS = {
+    "GET /category": 1,
+    "GET /category/{category_name}": 0,
+    "GET /product/all": 3,
+    "GET /product/all?limit": 3,
+    "GET /product/category/{category_name}": 2,
+    "GET /product/{product_id}": 3,
+    "GET /product/cart/{product_id}": 1,
+    "POST /product/cart": 1,
+    "GET /product/search/{query}": 4,
+    "GET /product/random/roulette": 4,
+    "GET /review/rating/{product_id}": 1,
+    "GET /review/{product_id}": 1,
+    "GET /review/{product_id}/{customer_id}": 1,
+    "GET /order/{customer_id}": 5,
+    "GET /order/recent/{customer_id}": 4,
+    "GET /order/recent/{customer_id}/wait": 4,
+    "GET /customer/exists/{customer_id}": 1,
+    "GET /customer/{customer_id}": 1,
+    "GET /address/{customer_id}": 1,
+    "GET /address/isMain/{customer_id}/{address_id}": 1,
+    "GET /health/pool": 0,
+    "POST /customer/create": 2,
+    "POST /customer/editName/{customer_id}": 2,
+    "POST /address/add/{customer_id}": 1,
+    "POST /address/update/{customer_id}/{address_id}": 2,
+    "POST /address/updateMain/{customer_id}/{address_id}": 3,
+    "POST /category/create": 4,
+    "POST /review/{product_id}/{customer_id}": 4,
+    "POST /order/checkout/session": 1,
+    "POST /order/webhook": 1,
+    "PUT /category/update/{category_id}": 7,
+    "DELETE /category/delete/{category_id}": 4,
+    "DELETE /address/delete/{customer_id}/{address_id}": 1,
+    "DELETE /customer/delete/{customer_id}": 1,
+}
+
+
+async def measure(requests: int, only):
+    # Every read has to reach the database to be counted
+    os.environ["CACHE_MAXSIZE"] = "0"
+    configure_environment(DB_URL)
+    app = load_app(DB_URL)
+
+    queries = []
+    for scale in SCALES:
+        # Each start opens a new, empty in-memory database
+        seed_on_startup(app, DB_URL, scale, 42)
+        results = await run_scenarios(app, requests, 4, 42, only)
+        queries.append(
+            {name: result["queries_max"] for name, result in results.items()}
+        )
+    return queries
+
+
+def check(small: dict, large: dict):
+    failures = []
+    for name in large:
+        budget = QUERY_BUDGETS.get(name)
+        if budget is None:
+            failures.append(f"{name}: no budget in QUERY_BUDGETS")
+        elif large[name] > budget:
+            failures.append(f"{name}: {large[name]} queries, budget is {budget}")
+        if large[name] > small.get(name, large[name]):
+            failures.append(
+                f"{name}: {small[name]} queries on the small dataset, "
+                f"{large[name]} on the large one"
+            )
+    return failures
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--requests", type=int, default=20, help="per endpoint")
+    parser.add_argument("--only", nargs="+", help="endpoints containing any of these")
+    args = parser.parse_args()
+
+    small, large = asyncio.run(measure(args.requests, args.only))
+    print(f"{'endpoint':<52} {'small':>5} {'large':>5} {'budget':>6}")
+    for name in large:
+        print(
+            f"{name:<52} {small.get(name, '-'):>5} {large[name]:>5}"
+            f" {QUERY_BUDGETS.get(name, '-'):>6}"
+        )
+
+    failures = check(small, large)
+    if failures:
+        print("Over budget:\n  " + "\n  ".join(failures))
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,100 @@
+"""Microbenchmark of /product/all response serialization.
+
+Compares the path FastAPI took before (``jsonable_encoder`` then the stdlib
+``JSONResponse``, plus ``response_model`` validation for routes that declare
+one) with ``ModelResponse``, and with sending the cached, pre-rendered body.
+
+    python bench/serialization.py [--sizes 1000 10000] [--reviews 3]
+"""
+
+import argparse
+import asyncio
+import statistics
+import sys
+import timeit
+from datetime import datetime, timezone
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "app"))
+
+from api.product.models import ProductModel  # noqa: E402
+from api.responses import ModelResponse, dump  # noqa: E402
+from api.review.models import ReviewModel  # noqa: E402
+from fastapi.responses import JSONResponse  # noqa: E402
+from fastapi.routing import serialize_response  # noqa: E402
+from fastapi.utils import create_response_field  # noqa: E402
+
+
+def build_products(size: int, reviews: int):
+    now = datetime.now(timezone.utc)
+    return [
+        ProductModel(
+            id=product_id,
+            category_name="soda",
+            image="cola.png",
+            name=f"Product {product_id}",
+            description="Fizzy and sweet carbonated beverage. " * 8,
+            brand="Brand",
+            price=1.99,
+            quantity=100,
+            rating=4.5,
+            reviews=[
+                ReviewModel(
+                    id=product_id * reviews + review_id,
+                    product_id=product_id,
+                    customer_id="customer",
+                    rating=5,
+                    title="Great",
+                    comment="Would buy again. " * 5,
+                    created_at=now,
+                    updated_at=now,
+                )
+                for review_id in range(reviews)
+            ],
+            created_at=now,
+            updated_at=now,
+        )
+        for product_id in range(size)
+    ]
+
+
+def fastapi_response(products, field=None):
+    """What FastAPI does with a handler's return value that is not a
+    Response: validate against ``response_model`` (if any), encode, render."""
+    content = asyncio.run(serialize_response(field=field, response_content=products))
+    return JSONResponse(content)
+
+
+def measure(fn, repeat: int):
+    fn()
+    return statistics.median(timeit.repeat(fn, number=1, repeat=repeat)) * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1000, 10000])
+    parser.add_argument("--reviews", type=int, default=3)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    field = create_response_field(name="response", type_=list[ProductModel])
+    for size in args.sizes:
+        products = build_products(size, args.reviews)
+        body = dump(products)
+        cases = {
+            "before: jsonable_encoder + JSONResponse": lambda: fastapi_response(
+                products
+            ),
+            "before: response_model + JSONResponse": lambda: fastapi_response(
+                products, field
+            ),
+            "after: ModelResponse": lambda: ModelResponse(products),
+            "after: cached body": lambda: ModelResponse(body),
+        }
+        print(f"{size} products, {args.reviews} reviews each, {len(body)} bytes")
+        for name, fn in cases.items():
+            print(f"  {name:<50} {measure(fn, args.repeat):10.2f} ms")
+
+
+if __name__ == "__main__":
+    main()
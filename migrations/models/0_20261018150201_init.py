@@ -0,0 +1,92 @@
+from tortoise import BaseDBAsyncClient
+
+
+async def upgrade(db: BaseDBAsyncClient) -> str:
+    return """
+        CREATE TABLE IF NOT EXISTS "categories" (
+    "id" SERIAL NOT NULL PRIMARY KEY,
+    "name" VARCHAR(255) NOT NULL,
+    "description" TEXT NOT NULL,
+    "created_at" TIMESTAMPTZ NOT NULL  DEFAULT CURRENT_TIMESTAMP,
+    "updated_at" TIMESTAMPTZ NOT NULL  DEFAULT CURRENT_TIMESTAMP
+);
+COMMENT ON TABLE "categories" IS 'The ''categories'' table classifies products into distinct categories, aiding in data organization and retrieval.';
+CREATE TABLE IF NOT EXISTS "customers" (
+    "id" VARCHAR(255) NOT NULL  PRIMARY KEY,
+    "first_name" VARCHAR(255) NOT NULL,
+    "last_name" VARCHAR(255) NOT NULL,
+    "email" VARCHAR(255) NOT NULL UNIQUE,
+    "created_at" TIMESTAMPTZ NOT NULL  DEFAULT CURRENT_TIMESTAMP,
+    "updated_at" TIMESTAMPTZ NOT NULL  DEFAULT CURRENT_TIMESTAMP
+);
+COMMENT ON TABLE "customers" IS 'The ''customers'' table stores information about customers.';
+CREATE TABLE IF NOT EXISTS "addresses" (
+    "id" SERIAL NOT NULL PRIMARY KEY,
+    "first_name" VARCHAR(255) NOT NULL,
+    "last_name" VARCHAR(255) NOT NULL,
+    "street" VARCHAR(255) NOT NULL,
+    "street2" VARCHAR(255),
+    "city" VARCHAR(255) NOT NULL,
+    "state" VARCHAR(2) NOT NULL,
+    "zip_code" VARCHAR(5) NOT NULL,
+    "country" VARCHAR(3) NOT NULL  DEFAULT 'USA',
+    "is_default" BOOL NOT NULL  DEFAULT False,
+    "created_at" TIMESTAMPTZ NOT NULL  DEFAULT CURRENT_TIMESTAMP,
+    "updated_at" TIMESTAMPTZ NOT NULL  DEFAULT CURRENT_TIMESTAMP,
+    "customer_id" VARCHAR(255) NOT NULL REFERENCES "customers" ("id") ON DELETE CASCADE
+);
+COMMENT ON TABLE "addresses" IS 'The ''addresses'' table stores addresses associated with customers.';
+CREATE TABLE IF NOT EXISTS "order" (
+    "id" SERIAL NOT NULL PRIMARY KEY,
+    "total_price" DECIMAL(10,2) NOT NULL,
+    "shippedDate" DATE,
+    "status" SMALLINT NOT NULL,
+    "orderDate" TIMESTAMPTZ NOT NULL  DEFAULT CURRENT_TIMESTAMP,
+    "customer_id" VARCHAR(255) NOT NULL REFERENCES "customers" ("id") ON DELETE CASCADE,
+    "shipAddress_id" INT NOT NULL REFERENCES "addresses" ("id") ON DELETE CASCADE
+);
+COMMENT ON COLUMN "order"."status" IS 'PROCESSING: 0\nSHIPPED: 1\nDELIVERED: 2';
+CREATE TABLE IF NOT EXISTS "products" (
+    "id" SERIAL NOT NULL PRIMARY KEY,
+    "image" VARCHAR(255) NOT NULL,
+    "name" VARCHAR(255) NOT NULL,
+    "description" TEXT NOT NULL,
+    "brand" VARCHAR(255) NOT NULL,
+    "price" DECIMAL(10,2) NOT NULL,
+    "quantity" INT NOT NULL,
+    "created_at" TIMESTAMPTZ NOT NULL  DEFAULT CURRENT_TIMESTAMP,
+    "updated_at" TIMESTAMPTZ NOT NULL  DEFAULT CURRENT_TIMESTAMP,
+    "category_id" INT NOT NULL REFERENCES "categories" ("id") ON DELETE CASCADE
+);
+COMMENT ON TABLE "products" IS 'The ''products'' table stores information about products.';
+CREATE TABLE IF NOT EXISTS "orderItems" (
+    "id" SERIAL NOT NULL PRIMARY KEY,
+    "quantity" INT NOT NULL,
+    "price" DECIMAL(10,2) NOT NULL,
+    "order_id" INT NOT NULL REFERENCES "order" ("id") ON DELETE CASCADE,
+    "product_id" INT NOT NULL REFERENCES "products" ("id") ON DELETE CASCADE
+);
+COMMENT ON TABLE "orderItems" IS 'The ''orderItems'' table stores information about each order and which items are within each separate order for each customer. ';
+CREATE TABLE IF NOT EXISTS "reviews" (
+    "id" SERIAL NOT NULL PRIMARY KEY,
+    "rating" SMALLINT NOT NULL,
+    "title" VARCHAR(255) NOT NULL,
+    "comment" TEXT NOT NULL,
+    "created_at" TIMESTAMPTZ NOT NULL  DEFAULT CURRENT_TIMESTAMP,
+    "updated_at" TIMESTAMPTZ NOT NULL  DEFAULT CURRENT_TIMESTAMP,
+    "customer_id" VARCHAR(255) NOT NULL REFERENCES "customers" ("id") ON DELETE CASCADE,
+    "product_id" INT NOT NULL REFERENCES "products" ("id") ON DELETE CASCADE
+);
+COMMENT ON COLUMN "reviews"."rating" IS 'ONE: 1\nTWO: 2\nTHREE: 3\nFOUR: 4\nFIVE: 5';
+COMMENT ON TABLE "reviews" IS 'The ''reviews'' table stores reviews associated with products.';
+CREATE TABLE IF NOT EXISTS "aerich" (
+    "id" SERIAL NOT NULL PRIMARY KEY,
+    "version" VARCHAR(255) NOT NULL,
+    "app" VARCHAR(100) NOT NULL,
+    "content" JSONB NOT NULL
+);"""
+
+
+async def downgrade(db: BaseDBAsyncClient) -> str:
+    return """
+        """
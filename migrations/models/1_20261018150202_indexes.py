@@ -0,0 +1,94 @@
+from tortoise import BaseDBAsyncClient
+
+
+async def upgrade(db: BaseDBAsyncClient) -> str:
+    return """
+        ALTER TABLE "products" ADD COLUMN IF NOT EXISTS "rating_count" INT NOT NULL  DEFAULT 0;
+        ALTER TABLE "products" ADD COLUMN IF NOT EXISTS "rating_sum" INT NOT NULL  DEFAULT 0;
+        ALTER TABLE "products" ADD COLUMN IF NOT EXISTS "rating_1" INT NOT NULL  DEFAULT 0;
+        ALTER TABLE "products" ADD COLUMN IF NOT EXISTS "rating_2" INT NOT NULL  DEFAULT 0;
+        ALTER TABLE "products" ADD COLUMN IF NOT EXISTS "rating_3" INT NOT NULL  DEFAULT 0;
+        ALTER TABLE "products" ADD COLUMN IF NOT EXISTS "rating_4" INT NOT NULL  DEFAULT 0;
+        ALTER TABLE "products" ADD COLUMN IF NOT EXISTS "rating_5" INT NOT NULL  DEFAULT 0;
+        DELETE FROM "reviews" USING "reviews" AS "newer"
+        WHERE "newer"."product_id" = "reviews"."product_id"
+            AND "newer"."customer_id" = "reviews"."customer_id"
+            AND "newer"."id" > "reviews"."id";
+        UPDATE "products" SET
+            "rating_count" = "summary"."count",
+            "rating_sum" = "summary"."sum",
+            "rating_1" = "summary"."rating_1",
+            "rating_2" = "summary"."rating_2",
+            "rating_3" = "summary"."rating_3",
+            "rating_4" = "summary"."rating_4",
+            "rating_5" = "summary"."rating_5"
+        FROM (
+            SELECT "product_id", COUNT(*) AS "count", SUM("rating") AS "sum",
+                COUNT(*) FILTER (WHERE "rating" = 1) AS "rating_1",
+                COUNT(*) FILTER (WHERE "rating" = 2) AS "rating_2",
+                COUNT(*) FILTER (WHERE "rating" = 3) AS "rating_3",
+                COUNT(*) FILTER (WHERE "rating" = 4) AS "rating_4",
+                COUNT(*) FILTER (WHERE "rating" = 5) AS "rating_5"
+            FROM "reviews" GROUP BY "product_id"
+        ) AS "summary"
+        WHERE "products"."id" = "summary"."product_id";
+        ALTER TABLE "products" ADD COLUMN IF NOT EXISTS "search_vector" tsvector
+            GENERATED ALWAYS AS (
+                setweight(to_tsvector('simple', coalesce("name", '')), 'A')
+                || setweight(to_tsvector('simple', coalesce("brand", '')), 'B')
+                || setweight(to_tsvector('simple', coalesce("description", '')), 'C')
+            ) STORED;
+        CREATE INDEX IF NOT EXISTS "idx_products_search_vector" ON "products" USING GIN ("search_vector");
+        CREATE TABLE IF NOT EXISTS "seed_state" (
+    "name" VARCHAR(255) NOT NULL  PRIMARY KEY,
+    "content_hash" VARCHAR(64) NOT NULL,
+    "updated_at" TIMESTAMPTZ NOT NULL  DEFAULT CURRENT_TIMESTAMP
+);
+COMMENT ON TABLE "seed_state" IS 'The ''seed_state'' table records the hash of the seed data last loaded, so unchanged data is not loaded again.';
+        CREATE TABLE IF NOT EXISTS "webhook_events" (
+    "id" VARCHAR(255) NOT NULL  PRIMARY KEY,
+    "type" VARCHAR(255) NOT NULL,
+    "payload" JSONB NOT NULL,
+    "status" SMALLINT NOT NULL  DEFAULT 0,
+    "attempts" INT NOT NULL  DEFAULT 0,
+    "next_attempt_at" TIMESTAMPTZ NOT NULL,
+    "last_error" TEXT,
+    "created_at" TIMESTAMPTZ NOT NULL  DEFAULT CURRENT_TIMESTAMP,
+    "processed_at" TIMESTAMPTZ
+);
+CREATE INDEX IF NOT EXISTS "idx_webhook_eve_status_034a2e" ON "webhook_events" ("status", "next_attempt_at");
+COMMENT ON COLUMN "webhook_events"."status" IS 'PENDING: 0\nPROCESSED: 1\nFAILED: 2';
+COMMENT ON TABLE "webhook_events" IS 'The ''webhook_events'' table is the inbox of Stripe events, keyed by Stripe event id, waiting to be processed by the order worker.';
+        CREATE INDEX IF NOT EXISTS "idx_addresses_custome_d30f8c" ON "addresses" ("customer_id", "is_default");
+        CREATE UNIQUE INDEX IF NOT EXISTS "uid_categories_name_c47ef4" ON "categories" ("name");
+        CREATE INDEX IF NOT EXISTS "idx_order_custome_2be5a5" ON "order" ("customer_id", "orderDate");
+        CREATE INDEX IF NOT EXISTS "idx_orderItems_order_i_d2a5d4" ON "orderItems" ("order_id");
+        CREATE INDEX IF NOT EXISTS "idx_products_brand_267435" ON "products" ("brand");
+        CREATE UNIQUE INDEX IF NOT EXISTS "uid_products_name_625ba0" ON "products" ("name");
+        CREATE INDEX IF NOT EXISTS "idx_reviews_product_3d4d17" ON "reviews" ("product_id", "created_at", "id");
+        CREATE INDEX IF NOT EXISTS "idx_reviews_product_e2e7a4" ON "reviews" ("product_id", "rating", "created_at");
+        CREATE UNIQUE INDEX IF NOT EXISTS "uid_reviews_product_165de3" ON "reviews" ("product_id", "customer_id");"""
+
+
+async def downgrade(db: BaseDBAsyncClient) -> str:
+    return """
+        DROP INDEX IF EXISTS "idx_orderItems_order_i_d2a5d4";
+        DROP INDEX IF EXISTS "uid_categories_name_c47ef4";
+        DROP INDEX IF EXISTS "uid_products_name_625ba0";
+        DROP INDEX IF EXISTS "idx_products_brand_267435";
+        DROP INDEX IF EXISTS "idx_addresses_custome_d30f8c";
+        DROP INDEX IF EXISTS "uid_reviews_product_165de3";
+        DROP INDEX IF EXISTS "idx_reviews_product_3d4d17";
+        DROP INDEX IF EXISTS "idx_reviews_product_e2e7a4";
+        DROP INDEX IF EXISTS "idx_order_custome_2be5a5";
+        DROP INDEX IF EXISTS "idx_products_search_vector";
+        ALTER TABLE "products" DROP COLUMN IF EXISTS "search_vector";
+        ALTER TABLE "products" DROP COLUMN IF EXISTS "rating_1";
+        ALTER TABLE "products" DROP COLUMN IF EXISTS "rating_2";
+        ALTER TABLE "products" DROP COLUMN IF EXISTS "rating_3";
+        ALTER TABLE "products" DROP COLUMN IF EXISTS "rating_4";
+        ALTER TABLE "products" DROP COLUMN IF EXISTS "rating_5";
+        ALTER TABLE "products" DROP COLUMN IF EXISTS "rating_count";
+        ALTER TABLE "products" DROP COLUMN IF EXISTS "rating_sum";
+        DROP TABLE IF EXISTS "seed_state";
+        DROP TABLE IF EXISTS "webhook_events";"""
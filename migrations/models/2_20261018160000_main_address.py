@@ -0,0 +1,17 @@
+from tortoise import BaseDBAsyncClient
+
+
+async def upgrade(db: BaseDBAsyncClient) -> str:
+    return """
+        UPDATE "addresses" SET "is_default" = FALSE
+        WHERE "is_default" AND "id" NOT IN (
+            SELECT DISTINCT ON ("customer_id") "id" FROM "addresses"
+            WHERE "is_default"
+            ORDER BY "customer_id", "updated_at" DESC, "id" DESC
+        );
+        CREATE UNIQUE INDEX IF NOT EXISTS "uid_addresses_customer_default" ON "addresses" ("customer_id") WHERE "is_default";"""
+
+
+async def downgrade(db: BaseDBAsyncClient) -> str:
+    return """
+        DROP INDEX IF EXISTS "uid_addresses_customer_default";"""
@@ -0,0 +1,18 @@
+from tortoise import BaseDBAsyncClient
+
+
+async def upgrade(db: BaseDBAsyncClient) -> str:
+    return """
+        ALTER TABLE "categories" ADD COLUMN IF NOT EXISTS "slug" VARCHAR(255);
+        UPDATE "categories" SET "slug" = trim(BOTH '-' FROM regexp_replace(lower("name"), '[^[:alnum:]]+', '-', 'g'))
+        WHERE "slug" IS NULL;
+        UPDATE "categories" SET "slug" = "slug" || '-' || "id"
+        WHERE "id" NOT IN (SELECT min("id") FROM "categories" GROUP BY "slug");
+        ALTER TABLE "categories" ALTER COLUMN "slug" SET NOT NULL;
+        CREATE UNIQUE INDEX IF NOT EXISTS "uid_categories_slug_3a37a8" ON "categories" ("slug");"""
+
+
+async def downgrade(db: BaseDBAsyncClient) -> str:
+    return """
+        DROP INDEX IF EXISTS "uid_categories_slug_3a37a8";
+        ALTER TABLE "categories" DROP COLUMN IF EXISTS "slug";"""